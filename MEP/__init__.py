@@ -19,7 +19,7 @@ Features include:
 __version__ = '1.2.0'
 
 
-from .formula import Formula, Expression, call, find
+from .formula import Formula, Expression, call, call_many, find, dump_library, load_library
 
 # from.draw import Draw
 from .math import Math
@@ -40,5 +40,8 @@ __all__ = [
     'Symbol', 
     'Math', 
     'call', 
+    'call_many', 
     'find', 
+    'dump_library', 
+    'load_library', 
 ] # removed class Draw
\ No newline at end of file
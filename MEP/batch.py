@@ -0,0 +1,376 @@
+# -*- coding: utf-8 -*-
+
+
+import operator
+from functools import reduce
+from types import ModuleType
+from typing import Any, Callable, Generator
+
+from .production import NumericValue, _Tree, _functions, _value_operators1e, _value_operators2e
+from .real import _domains, _real_counterparts, _real_function
+
+
+def _numpy() -> ModuleType:
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('numpy is required for batch evaluation') from None
+    return numpy
+
+def _elementwise(np: ModuleType, func: Callable[..., Any], args: list[Any]) -> Any:
+    # func applied to python values point by point, as scalar evaluation does
+    arrays: list[Any] = np.broadcast_arrays(*(np.asarray(arg) for arg in args))
+    shape: tuple[int, ...] = arrays[0].shape if arrays else ()
+    results: list[Any] = list(map(func, *(array.ravel().tolist() for array in arrays)))
+    return np.array(results).reshape(shape)
+
+def _number(np: ModuleType, x: Any) -> Any:
+    # bools are ints in arithmetic as in python, numpy keeps them bools or makes float16 of them
+    if type(x) is bool:
+        return int(x)
+    if getattr(x, 'dtype', None) == bool:
+        return np.asarray(x, dtype=np.int64)
+    return x
+
+def _operators(np: ModuleType) -> tuple[dict[str, Callable[[Any], Any]], dict[str, Callable[[Any, Any], Any]]]:
+    '''
+    Operators on arrays with the results of python operators on their values: bools
+    are ints in arithmetic, and integer results out of 64 bits, divisions by zero,
+    powers of negative bases to fractional exponents(complex) and float powers that
+    overflow are evaluated point by point, so they are what python gives or raise
+    as python does.
+    '''
+    kind: Callable[[Any], str] = lambda x: np.asarray(x).dtype.kind
+    number: Callable[[Any], Any] = lambda x: _number(np, x)
+
+    def magnitude(x: Any) -> int:
+        # the largest absolute value of integers, as a python int
+        x = np.asarray(x)
+        return max(abs(int(x.min())), abs(int(x.max()))) if x.size else 0
+
+    def overflows(func: Callable[[Any, Any], Any], x: Any, y: Any, bound: int) -> bool:
+        # results of integers may be out of 64 bits, by the bound of magnitudes first and by floats if it is too loose
+        if bound < 2 ** 63:
+            return False
+        return bool(np.any(np.abs(func(np.asarray(x, dtype=float), np.asarray(y, dtype=float))) >= 2.0 ** 63))
+
+    def arithmetic(name: str) -> Callable[[Any, Any], Any]:
+        func: Callable[[Any, Any], Any] = _value_operators2e[name]
+        def apply(x: Any, y: Any) -> Any:
+            x, y = number(x), number(y)
+            with np.errstate(all='ignore'):
+                if name in ('/', '//', '%'):
+                    if np.any(np.asarray(y) == 0):
+                        return _elementwise(np, func, [x, y])
+                elif name != '>>' and kind(x) in 'iu' and kind(y) in 'iu':
+                    x_magnitude, y_magnitude = magnitude(x), magnitude(y)
+                    if name == '<<':
+                        shifted: Callable[[Any, Any], Any] = lambda x, y: x * 2.0 ** y
+                        bound: int = x_magnitude << min(y_magnitude, 64)
+                        if overflows(shifted, x, y, bound):
+                            return _elementwise(np, func, [x, y])
+                    elif overflows(func, x, y, x_magnitude * y_magnitude if name == '*' else x_magnitude + y_magnitude):
+                        return _elementwise(np, func, [x, y])
+            return func(x, y)
+        return apply
+
+    def power(x: Any, y: Any) -> Any:
+        x, y = number(x), number(y)
+        x_kind, y_kind = kind(x), kind(y)
+        with np.errstate(all='ignore'):
+            if x_kind in 'iu' and y_kind in 'iu':
+                if np.any(np.asarray(y) < 0):
+                    return _elementwise(np, operator.pow, [x, y])
+                x_magnitude, y_magnitude = magnitude(x), magnitude(y)
+                bound: int = 2 ** 63 if x_magnitude > 1 and y_magnitude >= 63 else x_magnitude ** y_magnitude
+                if overflows(operator.pow, x, y, bound):
+                    return _elementwise(np, operator.pow, [x, y])
+                return x ** y
+            if x_kind in 'iuf' and y_kind in 'iuf':
+                # zero to negative powers, negative bases to fractional powers and overflows are not finite
+                result: Any = np.asarray(x, dtype=float) ** y
+                if not np.all(np.isfinite(result)) and \
+                np.any(~np.isfinite(result) & np.isfinite(x) & np.isfinite(y)):
+                    return _elementwise(np, operator.pow, [x, y])
+                return result
+            if x_kind in 'iufc' and y_kind in 'iufc':
+                # zero to complex powers raises as overflows do
+                result = x ** y
+                if np.any(np.asarray(x) == 0) or not np.all(np.isfinite(result)) and \
+                np.any(~np.isfinite(result) & np.isfinite(x) & np.isfinite(y)):
+                    return _elementwise(np, operator.pow, [x, y])
+                return result
+        return x ** y
+
+    def ordering(name: str) -> Callable[[Any, Any], Any]:
+        # complex numbers are not ordered
+        func: Callable[[Any, Any], Any] = _value_operators2e[name]
+        return lambda x, y: _elementwise(np, func, [x, y]) if 'c' in (kind(x), kind(y)) else func(x, y)
+
+    operators1e: dict[str, Callable[[Any], Any]] = {name: (lambda func: lambda x: func(number(x)))(func)
+        for name, func in _value_operators1e.items()}
+    operators2e: dict[str, Callable[[Any, Any], Any]] = {
+        **_value_operators2e,
+        **{name: arithmetic(name) for name in ('+', '-', '*', '/', '//', '%', '<<', '>>')},
+        **{name: ordering(name) for name in ('<', '>', '<=', '>=')},
+        '**': power,
+    }
+    return operators1e, operators2e
+
+def _kernels(np: ModuleType) -> dict[str, Callable[..., Any]]:
+    as_complex: Callable[[Any], Any] = lambda x: np.asarray(x, dtype=complex)
+    complex_ufunc: Callable[[Any], Callable[[Any], Any]] = lambda ufunc: lambda x: ufunc(as_complex(x))
+
+    def integral(ufunc: Callable[[Any], Any]) -> Callable[[Any], Any]:
+        # python gives ints, and raises for complex numbers, inf and nan, which numpy casts,
+        # floats out of 64 bits are whole numbers and are kept as they are
+        def kernel(x: Any) -> Any:
+            x = np.asarray(x)
+            if x.dtype.kind in 'biu':
+                return x.astype(np.int64)
+            if x.dtype.kind != 'f' or not np.all(np.isfinite(x)):
+                raise TypeError('not an array of finite real numbers')
+            result: Any = ufunc(x)
+            return result.astype(np.int64) if np.all(np.abs(result) < 2.0 ** 63) else result
+        return kernel
+
+    def real(x: Any) -> Any:
+        # python raises for complex numbers, which numpy casts
+        x = np.asarray(x)
+        if x.dtype.kind not in 'biuf':
+            raise TypeError('not an array of real numbers')
+        return x.astype(float)
+
+    return {
+        # basic
+        'abs': lambda x: np.abs(_number(np, x)),
+        'floor': integral(np.floor),
+        'ceil': integral(np.ceil),
+        'trunc': integral(np.trunc),
+        'round': lambda x, n=0: np.round(_number(np, x), n),
+        'int': integral(np.trunc),
+        'float': real,
+        'root': lambda x, y: x ** (1 / y),
+        'sqrt': complex_ufunc(np.sqrt),
+        'cbrt': lambda x: x ** (1 / 3),
+        'log': lambda x, base=None: np.log(as_complex(x)) if base is None else np.log(as_complex(x)) / np.log(as_complex(base)),
+
+        # lcg & gcd
+        'lcg': lambda *args: reduce(np.lcm, args, 1),
+        'gcd': lambda *args: reduce(np.gcd, args, 0),
+
+        # trigonometry
+        'sin': complex_ufunc(np.sin),
+        'cos': complex_ufunc(np.cos),
+        'tan': complex_ufunc(np.tan),
+        'asin': complex_ufunc(np.arcsin),
+        'acos': complex_ufunc(np.arccos),
+        'atan': complex_ufunc(np.arctan),
+        'hypot': lambda *args: np.sqrt(as_complex(sum(x ** 2 for x in args))),
+
+        # angle
+        'rtd': lambda x: np.pi / 180 * x,
+        'gtd': lambda x: x * (400 / 360),
+        'dtr': lambda x: 180 / np.pi * x,
+        'gtr': lambda x: 240 / np.pi * x,
+        'dtg': lambda x: x * (360 / 400),
+        'rtg': lambda x: np.pi / 240 * x,
+
+        # hyperbolic
+        'sinh': complex_ufunc(np.sinh),
+        'cosh': complex_ufunc(np.cosh),
+        'tanh': complex_ufunc(np.tanh),
+        'asinh': complex_ufunc(np.arcsinh),
+        'acosh': complex_ufunc(np.arccosh),
+        'atanh': complex_ufunc(np.arctanh),
+
+        # complex
+        'complex': lambda real, imag=0: as_complex(real) + 1j * imag,
+        'real': lambda x: 0j + np.real(x),
+        'imag': np.imag,
+        'conjugate': np.conjugate,
+        'phase': np.angle,
+        'modulus': np.abs,
+        'rect': lambda r, phi: r * np.exp(1j * as_complex(phi)),
+
+        # logic
+        'bool': lambda x: np.asarray(x).astype(bool),
+        'and': lambda *args: reduce(np.logical_and, args, True),
+        'or': lambda *args: reduce(np.logical_or, args, False),
+        'not': np.logical_not,
+        'xor': np.logical_xor,
+        'branch': lambda *args: np.select(args[1:-1:2], args[:-1:2], args[-1]),
+    }
+
+def _real_kernels(np: ModuleType, kernels: dict[str, Callable[..., Any]]) -> dict[str, Callable[..., Any]]:
+    # real ufuncs for arrays of real numbers in the domain of a function, the complex kernel otherwise
+    def real(name: str, ufunc: Callable[..., Any]) -> Callable[..., Any]:
+        complex_kernel: Callable[..., Any] = kernels[name]
+        domain: Callable[[Any], Any] | None = _domains.get(name)
+        def kernel(*args: Any) -> Any:
+            # bools are ints as in python, numpy would give float16
+            arrays: list[Any] = [np.asarray(arg) for arg in args]
+            arrays = [array.astype(np.int64) if array.dtype.kind == 'b' else array for array in arrays]
+            if all(array.dtype.kind in 'iuf' and (domain is None or np.all(domain(array))) for array in arrays):
+                return ufunc(*arrays)
+            return complex_kernel(*args)
+        return kernel
+
+    return {
+        **kernels,
+        'sqrt': real('sqrt', np.sqrt),
+        'log': real('log', lambda x, base=None: np.log(x) if base is None else np.log(x) / np.log(base)),
+        'hypot': real('hypot', lambda *args: np.sqrt(sum(x ** 2 for x in args))),
+        'sin': real('sin', np.sin),
+        'cos': real('cos', np.cos),
+        'tan': real('tan', np.tan),
+        'asin': real('asin', np.arcsin),
+        'acos': real('acos', np.arccos),
+        'atan': real('atan', np.arctan),
+        'sinh': real('sinh', np.sinh),
+        'cosh': real('cosh', np.cosh),
+        'tanh': real('tanh', np.tanh),
+        'asinh': real('asinh', np.arcsinh),
+        'acosh': real('acosh', np.arccosh),
+        'atanh': real('atanh', np.arctanh),
+        'real': real('real', np.real),
+    }
+
+class _BatchEvaluator:
+    '''
+    Evaluate an expression tree over arrays, once per node instead of once per point.
+
+    Operators are applied to whole arrays with the semantics of python operators;
+    functions are mapped to their numpy kernels, functions without a kernel are
+    applied elementwise as a fallback. Values are those of scalar evaluation, but
+    an array has one type: where points mix ints and floats all are floats, and
+    where any point is complex all are complex.
+    In the real domain, functions use real kernels for arrays of real numbers in
+    their domains and complex kernels otherwise.
+
+    Branches and logic are evaluated with masks: every argument is evaluated only
+    at the points where the result is not decided yet, and the value of a branch
+    only at the points where its condition is the first that holds.
+    '''
+
+    _kernel_table: dict[str, Callable[..., Any]] | None = None
+    _real_kernel_table: dict[str, Callable[..., Any]] | None = None
+    _operators1e: dict[str, Callable[[Any], Any]] = {}
+    _operators2e: dict[str, Callable[[Any, Any], Any]] = {}
+
+    def __init__(self, tree: _Tree._ProductionTree, real: bool=False) -> None:
+        self._np: ModuleType = _numpy()
+        if _BatchEvaluator._kernel_table is None:
+            _BatchEvaluator._kernel_table = _kernels(self._np)
+            _BatchEvaluator._real_kernel_table = _real_kernels(self._np, _BatchEvaluator._kernel_table)
+            _BatchEvaluator._operators1e, _BatchEvaluator._operators2e = _operators(self._np)
+        self._kernels: dict[str, Callable[..., Any]] = _BatchEvaluator._real_kernel_table if real else _BatchEvaluator._kernel_table
+        self._real: bool = real
+        self._tree: _Tree._ProductionTree = tree
+        self._evaluated: dict[_Tree._ProductionTree, Any] = {}
+
+    def _evaluate(self, kwargs: dict[str, Any]) -> Any:
+        np: ModuleType = self._np
+        arrays: dict[str, Any] = {key: np.asarray(value) for key, value in kwargs.items()}
+        shape: tuple[int, ...] = np.broadcast_shapes(*(array.shape for array in arrays.values()))
+        return np.broadcast_to(self._evaluate_tree(self._tree, arrays), shape)
+
+    def _evaluate_tree(self, tree: _Tree._ProductionTree, arrays: dict[str, Any]) -> Any:
+        # the points being evaluated with the results of repeated deterministic subtrees at them,
+        # the arguments of branches and logic push the points they are evaluated at
+        contexts: list[tuple[dict[str, Any], dict[_Tree._ProductionTree, Any]]] = [(arrays, self._evaluated)]
+        def visit(node: _Tree._ProductionTree, args: list[Any]) -> Any:
+            arrays, memo = contexts[-1]
+            result: Any = self._evaluate_node(node, args, arrays)
+            if node._deterministic:
+                memo[node] = result
+            return result
+        def expand(node: _Tree._ProductionTree) -> Generator[_Tree._ProductionTree, Any, Any] | None:
+            kind: str | None = _Tree._control(node)
+            return None if kind is None else self._evaluate_control(node, kind, contexts)
+        return _Tree._walk(tree, visit, None, lambda node: contexts[-1][1].get(node), expand)
+
+    def _evaluate_control(self, 
+        tree: _Tree._FunctionProductionTree, 
+        kind: str, 
+        contexts: list[tuple[dict[str, Any], dict[_Tree._ProductionTree, Any]]]) -> Generator[_Tree._ProductionTree, Any, Any]:
+        np: ModuleType = self._np
+        arrays, memo = contexts[-1]
+        shape: tuple[int, ...] = np.broadcast_shapes(*(np.shape(array) for array in arrays.values()))
+        points: dict[str, Any] = {key: np.broadcast_to(array, shape).ravel() for key, array in arrays.items()}
+        size: int = int(np.prod(shape))
+        # indices of the points where the result is not decided yet
+        undecided: Any = np.arange(size)
+        def evaluate(arg: _Tree._ProductionTree, indices: Any) -> Generator[_Tree._ProductionTree, Any, Any]:
+            # the subtree at some points, with a memo of its own since the points differ
+            contexts.append(({key: array[indices] for key, array in points.items()}, {}))
+            value: Any = yield arg
+            contexts.pop()
+            return np.broadcast_to(value, indices.shape)
+
+        if kind == 'branch':
+            pieces: list[tuple[Any, Any]] = []
+            for value, condition in zip(tree._args[:-1:2], tree._args[1::2]):
+                if not undecided.size:
+                    break
+                holds: Any = (yield from evaluate(condition, undecided)).astype(bool)
+                if holds.any():
+                    pieces.append((undecided[holds], (yield from evaluate(value, undecided[holds]))))
+                undecided = undecided[~holds]
+            if undecided.size:
+                pieces.append((undecided, (yield from evaluate(tree._args[-1], undecided))))
+            result: Any = np.empty(size, dtype=np.result_type(*(piece for _, piece in pieces)) if pieces else float)
+            for indices, piece in pieces:
+                result[indices] = piece
+        else:
+            decided: bool = kind != 'and'
+            result = np.full(size, not decided)
+            for arg in tree._args:
+                if not undecided.size:
+                    break
+                truth: Any = (yield from evaluate(arg, undecided)).astype(bool)
+                if not decided:
+                    truth = ~truth
+                result[undecided[truth]] = decided
+                undecided = undecided[~truth]
+        result = result.reshape(shape)
+        if tree._deterministic:
+            memo[tree] = result
+        return result
+
+    def _evaluate_node(self, tree: _Tree._ProductionTree, args: list[Any], arrays: dict[str, Any]) -> Any:
+        if isinstance(tree, _Tree._NumericProductionTree):
+            return tree._value
+        if isinstance(tree, _Tree._SymbolProductionTree):
+            return arrays[tree._sign]
+        if isinstance(tree, _Tree._FunctionProductionTree):
+            return self._call(tree, args)
+        if isinstance(tree, _Tree._OperatorProductionTree1E):
+            return _BatchEvaluator._operators1e[tree._operator](args[0])
+        if isinstance(tree, _Tree._OperatorProductionTree2E):
+            return _BatchEvaluator._operators2e[tree._operator](args[0], args[1])
+        raise ValueError('Bad tree was given.')
+
+    def _call(self, tree: _Tree._FunctionProductionTree, args: list[Any]) -> Any:
+        kernel: Callable[..., Any] | None = self._kernels.get(tree._operator)
+        builtin: bool = _functions.get(tree._operator) is tree._func
+        if kernel is not None and builtin:
+            try:
+                result: Any = kernel(*args)
+            except (ArithmeticError, TypeError, ValueError):
+                pass
+            else:
+                if not self._overflows(result):
+                    return result
+        if self._real and builtin and tree._operator in _real_counterparts:
+            return self._fallback(_real_function(tree._operator, tree._func), args)
+        return self._fallback(tree._func, args)
+
+    def _overflows(self, result: Any) -> bool:
+        # numpy gives inf or nan where python may raise, such as for overflows within a function
+        np: ModuleType = self._np
+        result = np.asarray(result)
+        return result.dtype.kind in 'fc' and not np.all(np.isfinite(result))
+
+    def _fallback(self, func: Callable[..., NumericValue], args: list[Any]) -> Any:
+        return _elementwise(self._np, func, args)
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+
+from collections import OrderedDict
+from typing import Any, Callable
+
+from .production import NumericValue
+
+
+class _ExpressionCache:
+    '''
+    Least recently used cache of the values of a formula, keyed by its arguments.
+    '''
+
+    def __init__(self, func: Callable[[], Callable[[dict], NumericValue]], args: set[str], maxsize: int) -> None:
+        self._func: Callable[[], Callable[[dict], NumericValue]] = func # returns the current evaluator of formula
+        self._params: tuple[str, ...] = tuple(sorted(args))
+        self._maxsize: int = maxsize
+        self._values: OrderedDict[tuple, NumericValue] = OrderedDict()
+        self._hits: int = 0
+        self._misses: int = 0
+
+    def __call__(self, kwargs: dict[str, NumericValue]) -> NumericValue:
+        key: tuple = tuple(self._key(kwargs[param]) for param in self._params)
+        try:
+            value: NumericValue = self._values[key]
+        except KeyError:
+            self._misses += 1
+            value = self._func()(kwargs)
+            self._values[key] = value
+            if len(self._values) > self._maxsize:
+                self._values.popitem(last=False)
+            return value
+        self._hits += 1
+        self._values.move_to_end(key)
+        return value
+
+    @staticmethod
+    def _key(value: NumericValue) -> Any:
+        # 1, 1.0 and True are equal but give different results, so are 0.0 and -0.0 (or
+        # complex numbers with signed zero parts) on branch cuts
+        if value and type(value) is not complex:
+            return type(value), value
+        return type(value), repr(value)
+
+    def _info(self) -> dict[str, int]:
+        return {
+            'hits': self._hits, 
+            'misses': self._misses, 
+            'size': len(self._values), 
+            'maxsize': self._maxsize, 
+        }
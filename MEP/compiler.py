@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+
+import math
+from typing import Callable, Generator
+
+from .production import NumericValue, _Tree
+
+
+# the value of a branch until one of its conditions holds
+_UNSET: object = object()
+# guarded blocks nested deeper than this are flattened, python allows 100 levels of indentation
+_MAX_BLOCKS: int = 32
+
+
+class _Compiler:
+    '''
+    Lower an expression tree into one flat python function.
+
+    Every operator node becomes a single assignment to a local temporary, symbols
+    become positional parameters and numeric constants are inlined as literals, so
+    evaluating the result costs one python frame instead of one per node.
+
+    With common subexpression elimination, a repeated deterministic subtree (which
+    is the same interned node wherever it appears) is assigned once and reused.
+
+    Branches and logic are lowered into guarded blocks at the same depth, so only
+    the arguments that decide the result are computed. A subtree first computed in
+    a guarded block is only reused within that block. Blocks nested too deep for
+    python are guarded statement by statement by a flag instead.
+    '''
+
+    def __init__(self, tree: _Tree._ProductionTree, args: set[str], cse: bool=True) -> None:
+        self._tree: _Tree._ProductionTree = tree
+        self._cse: bool = cse
+        self._emitted: dict[_Tree._ProductionTree, str] = {}
+        self._params: list[str] = sorted(args)
+        self._lines: list[str] = []
+        self._namespace: dict[str, object] = {}
+        self._names: dict[int, str] = {}
+        self._temp_count: int = 0
+        self._indent: str = ''
+        self._flag: str | None = None
+        self._flag_count: int = 0
+
+    def _compile(self) -> tuple[Callable[..., NumericValue], Callable[[dict], NumericValue]]:
+        result: str = self._emit(self._tree)
+        body: str = ''.join(f'    {line}\n' for line in self._lines)
+        params: str = ', '.join(self._params)
+        unpack: str = ', '.join(f'kwargs[{param!r}]' for param in self._params)
+        source: str = (
+            f'def _positional({params}):\n{body}    return {result}\n'
+            f'def _keyword(kwargs):\n    return _positional({unpack})\n')
+        exec(compile(source, '<MEP compiled formula>', 'exec'), self._namespace)
+        return self._namespace['_positional'], self._namespace['_keyword']
+
+    def _stats(self) -> dict[str, int]:
+        return {
+            'nodes': self._tree._size, 
+            'evaluated': self._temp_count, 
+            'deduplicated': self._tree._size - self._temp_count, 
+        }
+
+    def _emit(self, tree: _Tree._ProductionTree) -> str:
+        return _Tree._walk(tree, self._emit_node, self._emitted if self._cse else None, expand=self._emit_control)
+
+    def _emit_control(self, tree: _Tree._ProductionTree) -> Generator[_Tree._ProductionTree, str, str] | None:
+        kind: str | None = _Tree._control(tree)
+        if kind is None:
+            return None
+        return self._emit_lazy(tree._args, kind)
+
+    def _emit_lazy(self, args: tuple[_Tree._ProductionTree, ...], kind: str) -> Generator[_Tree._ProductionTree, str, str]:
+        # yields the arguments to be emitted where they are needed and receives their names
+        name: str = f'_t{self._temp_count}'
+        self._temp_count += 1
+        if kind == 'branch':
+            # the result is unset until a condition holds, every later pair is guarded by that
+            unset: str = self._bind(_UNSET)
+            self._line(f'{name} = {unset}')
+            for index in range(0, len(args) - 1, 2):
+                guard: tuple | None = self._enter(f'{name} is {unset}') if index else None
+                condition: str = yield args[index + 1]
+                test: tuple = self._enter(condition)
+                value: str = yield args[index]
+                self._line(f'{name} = {value}')
+                self._leave(test)
+                if guard is not None:
+                    self._leave(guard)
+            guard = self._enter(f'{name} is {unset}')
+            value = yield args[-1]
+            self._line(f'{name} = {value}')
+            self._leave(guard)
+        else:
+            # the truth of arguments so far, later arguments are guarded by that
+            value = yield args[0]
+            self._line(f'{name} = True if {value} else False')
+            for arg in args[1:]:
+                guard = self._enter(name if kind == 'and' else f'not {name}')
+                value = yield arg
+                self._line(f'{name} = True if {value} else False')
+                self._leave(guard)
+        return name
+
+    def _enter(self, condition: str) -> tuple[str, str | None, int]:
+        # a block guarded by condition, blocks nested deeper than python allows are flattened
+        # into a flag, which guards every statement in them instead
+        state: tuple[str, str | None, int] = (self._indent, self._flag, len(self._emitted))
+        if self._flag is None and len(self._indent) < 4 * _MAX_BLOCKS:
+            self._lines.append(f'{self._indent}if {condition}:')
+            self._indent += '    '
+        else:
+            flag: str = f'_f{self._flag_count}'
+            self._flag_count += 1
+            held: str = condition if self._flag is None else f'{self._flag} and {condition}'
+            self._lines.append(f'{self._indent}{flag} = True if {held} else False')
+            self._flag = flag
+        return state
+
+    def _leave(self, state: tuple[str, str | None, int]) -> None:
+        # subtrees first computed in a guarded block may be unset after it, so they are forgotten
+        self._indent, self._flag, count = state
+        while len(self._emitted) > count:
+            self._emitted.popitem()
+
+    def _line(self, statement: str) -> None:
+        self._lines.append(f'{self._indent}{statement}' if self._flag is None else f'{self._indent}if {self._flag}: {statement}')
+
+    def _emit_node(self, tree: _Tree._ProductionTree, args: list[str]) -> str:
+        if isinstance(tree, _Tree._NumericProductionTree):
+            return self._constant(tree._value)
+        if isinstance(tree, _Tree._SymbolProductionTree):
+            return tree._sign
+        if isinstance(tree, _Tree._FunctionProductionTree):
+            return self._assign(f'{self._function(tree)}({", ".join(args)})')
+        if isinstance(tree, _Tree._OperatorProductionTree1E):
+            return self._assign(f'{tree._operator}{args[0]}')
+        if isinstance(tree, _Tree._OperatorProductionTree2E):
+            return self._assign(f'{args[0]} {tree._operator} {args[1]}')
+        raise ValueError('Bad tree was given.')
+
+    def _assign(self, expression: str) -> str:
+        name: str = f'_t{self._temp_count}'
+        self._temp_count += 1
+        self._line(f'{name} = {expression}')
+        return name
+
+    def _constant(self, value: NumericValue) -> str:
+        if isinstance(value, bool | int) or \
+        (isinstance(value, float) and math.isfinite(value)) or \
+        (isinstance(value, complex) and math.isfinite(value.real) and math.isfinite(value.imag)):
+            if isinstance(value, complex) and (value.real == 0 or value.imag == 0):
+                # a literal such as -1j is -(0+1j), whose real part is -0.0 instead of 0.0, the
+                # signs of zero parts are kept by a call, other literals evaluate to their values
+                return f'complex({value.real!r}, {value.imag!r})'
+            literal: str = repr(value)
+            return f'({literal})' if literal.startswith('-') else literal
+        return self._bind(value)
+
+    def _function(self, tree: _Tree._FunctionProductionTree) -> str:
+        if tree._func is None:
+            raise ValueError(f'function {tree._operator} cannot be compiled')
+        return self._bind(tree._func)
+
+    def _bind(self, obj: object) -> str:
+        name: str | None = self._names.get(id(obj))
+        if name is None:
+            name = f'_g{len(self._names)}'
+            self._names[id(obj)] = name
+            self._namespace[name] = obj
+        return name
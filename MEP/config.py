@@ -5,9 +5,13 @@
 EXPRESSION_MAX_CACH: int = 256
 SIGN_CH_L: str = '$'
 SIGN_CH_R: str = '@'
+AUTO_COMPILE: bool = False
+MAX_CLOSURE_DEPTH: int = 200
+REAL_DOMAIN: bool = False
 
 #production
 SAFE_MODE: bool = True
+AUTO_SIMPLIFY: bool = False
 
 # draw
 DEFULT_COLORS: dict[str] = {
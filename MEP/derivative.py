@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+
+
+from typing import Callable, TypeAlias
+
+from .compiler import _Compiler
+from .production import NumericValue, _Tree, _functions, _lazy_functions
+from .real import _real_node
+
+
+Tree: TypeAlias = _Tree._ProductionTree
+_ZERO: Tree = _Tree._NumericProductionTree(0)
+_ONE: Tree = _Tree._NumericProductionTree(1)
+
+# functions that multiply their argument by a constant
+_linear: set[str] = {'float', 'rtd', 'gtd', 'dtr', 'gtr', 'dtg', 'rtg', 'real', 'imag', 'conjugate'}
+
+
+def _is_zero(tree: Tree) -> bool:
+    return isinstance(tree, _Tree._NumericProductionTree) and not isinstance(tree._value, bool) and tree._value == 0
+
+def _is_one(tree: Tree) -> bool:
+    return isinstance(tree, _Tree._NumericProductionTree) and not isinstance(tree._value, bool) and tree._value == 1
+
+def _number(value: NumericValue) -> Tree:
+    return _Tree._NumericProductionTree(value)
+
+# derivatives are new formulas, so identities are dropped whatever the types of operands
+def _add(left: Tree, right: Tree) -> Tree:
+    if _is_zero(left):
+        return right
+    if _is_zero(right):
+        return left
+    return _Tree._fold(_Tree._OperatorProductionTree2E('+', left, right, 10))
+
+def _sub(left: Tree, right: Tree) -> Tree:
+    if _is_zero(left):
+        return _neg(right)
+    if _is_zero(right):
+        return left
+    return _Tree._fold(_Tree._OperatorProductionTree2E('-', left, right, 10))
+
+def _mul(left: Tree, right: Tree) -> Tree:
+    if _is_zero(left) or _is_zero(right):
+        return _ZERO
+    if _is_one(left):
+        return right
+    if _is_one(right):
+        return left
+    return _Tree._fold(_Tree._OperatorProductionTree2E('*', left, right, 11))
+
+def _div(left: Tree, right: Tree) -> Tree:
+    if _is_zero(left):
+        return _ZERO
+    return _Tree._fold(_Tree._OperatorProductionTree2E('/', left, right, 11))
+
+def _pow(left: Tree, right: Tree) -> Tree:
+    if _is_one(right):
+        return left
+    return _Tree._fold(_Tree._OperatorProductionTree2E('**', left, right, 13))
+
+def _neg(value: Tree) -> Tree:
+    if isinstance(value, _Tree._OperatorProductionTree1E) and value._operator == '-':
+        return value._value
+    return _Tree._fold(_Tree._OperatorProductionTree1E('-', value, 12))
+
+def _call(name: str, *args: Tree) -> Tree:
+    # functions of constants are folded by the simplifier, in the domain of formula
+    return _Tree._FunctionProductionTree(name, *args, func=_functions[name])
+
+def _sqrt_of_one_minus_square(x: Tree) -> Tree:
+    return _call('sqrt', _sub(_ONE, _pow(x, _number(2))))
+
+def _hypot_partial(args: tuple[Tree, ...], index: int) -> Tree:
+    return _div(args[index], _call('hypot', *args))
+
+def _dist_partial(args: tuple[Tree, ...], index: int) -> Tree:
+    half: int = len(args) // 2
+    difference: Tree = _sub(args[index], args[index + half]) if index < half else _sub(args[index], args[index - half])
+    return _div(difference, _call('dist', *args))
+
+def _root_partial(args: tuple[Tree, ...], index: int) -> Tree:
+    x, y = args
+    root: Tree = _call('root', x, y)
+    if index == 0:
+        return _div(root, _mul(y, x))
+    return _neg(_div(_mul(root, _call('log', x)), _pow(y, _number(2))))
+
+def _log_partial(args: tuple[Tree, ...], index: int) -> Tree:
+    if len(args) == 1:
+        return _div(_ONE, args[0])
+    x, base = args
+    if index == 0:
+        return _div(_ONE, _mul(x, _call('log', base)))
+    return _neg(_div(_call('log', x), _mul(base, _pow(_call('log', base), _number(2)))))
+
+def _rect_partial(args: tuple[Tree, ...], index: int) -> Tree:
+    r, phi = args
+    if index == 0:
+        return _call('rect', _ONE, phi)
+    return _mul(_number(1j), _call('rect', r, phi))
+
+# partial derivative of a function by its argument at the index, as a tree of its arguments,
+# functions that are piecewise constant, discrete or random(floor, branch, rand, etc.) have none
+_partials: dict[str, Callable[[tuple[Tree, ...], int], Tree]] = {
+    'abs': lambda args, _: _div(args[0], _call('abs', args[0])),
+    'modulus': lambda args, _: _div(args[0], _call('modulus', args[0])),
+    'sqrt': lambda args, _: _div(_ONE, _mul(_number(2), _call('sqrt', args[0]))),
+    'cbrt': lambda args, _: _div(_ONE, _mul(_number(3), _pow(_call('cbrt', args[0]), _number(2)))),
+    'root': _root_partial,
+    'log': _log_partial,
+    'sin': lambda args, _: _call('cos', args[0]),
+    'cos': lambda args, _: _neg(_call('sin', args[0])),
+    'tan': lambda args, _: _div(_ONE, _pow(_call('cos', args[0]), _number(2))),
+    'asin': lambda args, _: _div(_ONE, _sqrt_of_one_minus_square(args[0])),
+    'acos': lambda args, _: _neg(_div(_ONE, _sqrt_of_one_minus_square(args[0]))),
+    'atan': lambda args, _: _div(_ONE, _add(_ONE, _pow(args[0], _number(2)))),
+    'hypot': _hypot_partial,
+    'dist': _dist_partial,
+    'sinh': lambda args, _: _call('cosh', args[0]),
+    'cosh': lambda args, _: _call('sinh', args[0]),
+    'tanh': lambda args, _: _div(_ONE, _pow(_call('cosh', args[0]), _number(2))),
+    'asinh': lambda args, _: _div(_ONE, _call('sqrt', _add(_pow(args[0], _number(2)), _ONE))),
+    'acosh': lambda args, _: _div(_ONE, _call('sqrt', _sub(_pow(args[0], _number(2)), _ONE))),
+    'atanh': lambda args, _: _div(_ONE, _sub(_ONE, _pow(args[0], _number(2)))),
+    'complex': lambda _, index: _ONE if index == 0 else _number(1j),
+    'rect': _rect_partial,
+}
+
+def _function_partial(tree: _Tree._FunctionProductionTree) -> Callable[[tuple[Tree, ...], int], Tree]:
+    name: str = tree._operator
+    if _functions.get(name) is tree._func:
+        if name in _linear:
+            return lambda *_: _call(name, _ONE)
+        partial: Callable[[tuple[Tree, ...], int], Tree] | None = _partials.get(name)
+        if partial is not None:
+            return partial
+    raise ValueError(f'function {name} is not differentiable')
+
+def _check_control(tree: Tree, _: list) -> None:
+    # conditions of branches and logic are not differentiable either, the function that holds them is reported
+    if isinstance(tree, _Tree._FunctionProductionTree) and tree._func in _lazy_functions:
+        raise ValueError(f'function {tree._operator} is not differentiable, branches and logic select values by conditions')
+
+def _operator_partial(tree: Tree, index: int) -> Tree:
+    if isinstance(tree, _Tree._OperatorProductionTree1E):
+        match tree._operator:
+            case '+':
+                return _ONE
+            case '-':
+                return _number(-1)
+    elif isinstance(tree, _Tree._OperatorProductionTree2E):
+        u, v = tree._value1, tree._value2
+        match tree._operator, index:
+            case '+', _:
+                return _ONE
+            case '-', _:
+                return _ONE if index == 0 else _number(-1)
+            case '*', _:
+                return v if index == 0 else u
+            case '/', _:
+                return _div(_ONE, v) if index == 0 else _neg(_div(tree, v))
+            case '%', _:
+                return _ONE if index == 0 else _neg(_Tree._fold(_Tree._OperatorProductionTree2E('//', u, v, 11)))
+            case '**', 0:
+                return _mul(v, _pow(u, _sub(v, _ONE)))
+            case '**', 1:
+                return _mul(tree, _call('log', u))
+    raise ValueError(f'operator {tree._operator} is not differentiable')
+
+class _Differentiator:
+    '''
+    Differentiate an expression tree by a symbol.
+
+    The derivative of every node is built from the derivatives of its children by
+    the sum and product rules and the chain rule with the partial derivatives of
+    functions. Terms multiplied by zero are dropped and constants are folded while
+    the tree is built, and repeated subtrees are differentiated once.
+    '''
+
+    def __init__(self, sign: str) -> None:
+        self._sign: str = sign
+
+    def _differentiate(self, tree: Tree) -> Tree:
+        _Tree._walk(tree, _check_control, {})
+        return _Tree._walk(tree, self._differentiate_node, {})
+
+    def _differentiate_node(self, tree: Tree, derivatives: list[Tree]) -> Tree:
+        if isinstance(tree, _Tree._NumericProductionTree):
+            return _ZERO
+        if isinstance(tree, _Tree._SymbolProductionTree):
+            return _ONE if tree._sign == self._sign else _ZERO
+        if all(_is_zero(derivative) for derivative in derivatives):
+            return _ZERO
+        if isinstance(tree, _Tree._FunctionProductionTree):
+            return self._differentiate_function(tree, derivatives)
+        if isinstance(tree, _Tree._OperatorProductionTree1E):
+            return self._differentiate_operator1e(tree, derivatives[0])
+        if isinstance(tree, _Tree._OperatorProductionTree2E):
+            return self._differentiate_operator2e(tree, *derivatives)
+        raise ValueError('Bad tree was given.')
+
+    def _differentiate_function(self, tree: _Tree._FunctionProductionTree, derivatives: list[Tree]) -> Tree:
+        partial: Callable[[tuple[Tree, ...], int], Tree] = _function_partial(tree)
+        if tree._operator in _linear:
+            return _call(tree._operator, derivatives[0])
+        result: Tree = _ZERO
+        for index, derivative in enumerate(derivatives):
+            if not _is_zero(derivative):
+                result = _add(result, _mul(partial(tree._args, index), derivative))
+        return result
+
+    def _differentiate_operator1e(self, tree: _Tree._OperatorProductionTree1E, derivative: Tree) -> Tree:
+        match tree._operator:
+            case '+':
+                return derivative
+            case '-':
+                return _neg(derivative)
+        raise ValueError(f'operator {tree._operator} is not differentiable')
+
+    def _differentiate_operator2e(self, tree: _Tree._OperatorProductionTree2E, left_derivative: Tree, right_derivative: Tree) -> Tree:
+        u, v = tree._value1, tree._value2
+        du, dv = left_derivative, right_derivative
+        match tree._operator:
+            case '+':
+                return _add(du, dv)
+            case '-':
+                return _sub(du, dv)
+            case '*':
+                return _add(_mul(du, v), _mul(u, dv))
+            case '/':
+                if _is_zero(dv):
+                    return _div(du, v)
+                return _div(_sub(_mul(du, v), _mul(u, dv)), _pow(v, _number(2)))
+            case '%': # u % v == u - v*(u//v), and u//v is piecewise constant
+                return _sub(du, _mul(_Tree._fold(_Tree._OperatorProductionTree2E('//', u, v, 11)), dv))
+            case '**':
+                result: Tree = _ZERO
+                if not _is_zero(du):
+                    result = _mul(_mul(v, _pow(u, _sub(v, _ONE))), du)
+                if not _is_zero(dv):
+                    result = _add(result, _mul(_mul(tree, _call('log', u)), dv))
+                return result
+        raise ValueError(f'operator {tree._operator} is not differentiable')
+
+
+class _GradientCompiler(_Compiler):
+    '''
+    Lower an expression tree and its gradient by all arguments into one flat python function.
+
+    The adjoint of every distinct node is built as a tree from the root back to the
+    symbols, as the sum of the adjoints of its parents times their partial derivatives
+    by it, so the gradient is one backward sweep however many arguments there are.
+    Partial derivatives refer to the nodes of formula, which are already computed
+    by the forward sweep, and every distinct node is computed once.
+    '''
+
+    def _compile_gradient(self, real: bool=False) -> Callable[[dict], tuple[NumericValue, dict[str, NumericValue]]]:
+        _Tree._walk(self._tree, _check_control, {})
+        names: dict[Tree, str] = {}
+        def visit(node: Tree, args: list[str]) -> str:
+            # derivatives are built from the original functions, the real ones are only emitted
+            names[node] = self._emit_node(_real_node(node, list(_Tree._children(node))) if real else node, args)
+            return names[node]
+
+        result: str = _Tree._walk(self._tree, visit, None, names.get)
+        adjoints: dict[str, Tree] = self._adjoints()
+        gradient: str = ', '.join(f'{param!r}: {_Tree._walk(adjoints.get(param, _ZERO), visit, None, names.get)}' for param in self._params)
+        body: str = ''.join(f'    {line}\n' for line in self._lines)
+        unpack: str = ''.join(f'    {param} = kwargs[{param!r}]\n' for param in self._params)
+        source: str = f'def _gradient(kwargs):\n{unpack}{body}    return {result}, {{{gradient}}}\n'
+        exec(compile(source, '<MEP compiled gradient>', 'exec'), self._namespace)
+        return self._namespace['_gradient']
+
+    def _adjoints(self) -> dict[str, Tree]:
+        nodes: list[Tree] = []
+        seen: set[Tree] = set()
+        stack: list[tuple[Tree, bool]] = [(self._tree, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if expanded:
+                nodes.append(node)
+            elif node not in seen:
+                seen.add(node)
+                stack.append((node, True))
+                stack.extend([(child, False) for child in reversed(_Tree._children(node))])
+
+        # only subtrees with symbols have derivatives
+        depends: set[Tree] = set()
+        for node in nodes:
+            if isinstance(node, _Tree._SymbolProductionTree) or any(child in depends for child in _Tree._children(node)):
+                depends.add(node)
+
+        # parents come before their children in reverse post-order
+        adjoints: dict[Tree, Tree] = {self._tree: _ONE}
+        for node in reversed(nodes):
+            if node not in depends or isinstance(node, _Tree._SymbolProductionTree):
+                continue
+            adjoint: Tree = adjoints[node]
+            for index, child in enumerate(_Tree._children(node)):
+                if child in depends:
+                    term: Tree = _mul(adjoint, self._partial(node, index))
+                    adjoints[child] = _add(adjoints[child], term) if child in adjoints else term
+        return {node._sign: adjoint for node, adjoint in adjoints.items() if isinstance(node, _Tree._SymbolProductionTree)}
+
+    def _partial(self, tree: Tree, index: int) -> Tree:
+        if isinstance(tree, _Tree._FunctionProductionTree):
+            return _function_partial(tree)(tree._args, index)
+        return _operator_partial(tree, index)
@@ -2,22 +2,47 @@
 
 
 import math
-from typing import Callable, NoReturn, overload
+import re
+from typing import Any, Callable, Iterable, Iterator, NoReturn, overload
 
+from . import config
+from .batch import _BatchEvaluator
+from .cache import _ExpressionCache
+from .compiler import _Compiler
 from .config import *
-from .production import _Production, _relock, _unlock, NumericValue, _Tree
+from .derivative import _Differentiator, _GradientCompiler
+from .library import _FormulaLibrary
+from .parallel import _ParallelEvaluator
+from .parser import _FormulaParser
+from .profiler import _Profiler
+from .stream import _StreamEvaluator
+from .real import _real_tree
+from .production import _Production, _Productor, _get_production_attributes, NumericValue, _Tree
+from .serializer import _TreeSerializer
+from .simplifier import _Simplifier
+from .vm import _VirtualMachine
 
 # from.draw import Draw
 
 
 _named_formulas: 'dict[str, Formula]' = {}
+_libraries: list[_FormulaLibrary] = []
 
 def _name_check(name: str) -> 'Formula | NoReturn':
     formula: Formula | None = _named_formulas.get(name, None)
+    if formula is None:
+        formula = _library_lookup(name)
     if formula is None:
         raise ValueError(f'No such a formula named {name}')
     return formula
 
+def _library_lookup(name: str) -> 'Formula | None':
+    for library in reversed(_libraries):
+        data: memoryview | None = library._get(name)
+        if data is not None:
+            return Formula.loads(data, name)
+    return None
+
 def _to_production(v: 'Formula | NumericValue') -> _Production | NumericValue:
     if isinstance(v, Formula):
         return v._formula._production
@@ -40,6 +65,37 @@ def call(name: str, **kwargs: NumericValue) -> 'Expression | NoReturn':
     formula = _name_check(name)
     return formula.subs(**kwargs)
 
+def call_many(requests: Iterable[tuple[str, dict[str, NumericValue]]]) -> list[NumericValue]:
+    '''
+    Call named formulas with many sets of arguments at once.
+
+    Requests are grouped by formula, every formula is looked up once and evaluated 
+    for its whole group without creating expressions, by the backend chosen with 
+    "Formula.set_backend" and with the cache of formula as "subs" is.
+
+    Args:
+        requests (Iterable[tuple[str, dict]]): Pairs of the name of formula and its arguments.
+    
+    Returns:
+        list: Value of each request, in the order of requests.
+    
+    Raises:
+        ValueError: No such a formula named..., or the given arguments does not match formula's argument set.
+    '''
+    groups: dict[str, tuple[list[int], list[dict[str, NumericValue]]]] = {}
+    count: int = 0
+    for index, (name, kwargs) in enumerate(requests):
+        positions, kwargs_list = groups.setdefault(name, ([], []))
+        positions.append(index)
+        kwargs_list.append(kwargs)
+        count += 1
+
+    values: list[NumericValue] = [None] * count
+    for name, (positions, kwargs_list) in groups.items():
+        for position, value in zip(positions, _name_check(name)._formula._call_many(kwargs_list)):
+            values[position] = value
+    return values
+
 def find(name: str) -> 'Formula | NoReturn':
     '''
     Get a formula matches the name.
@@ -56,6 +112,41 @@ def find(name: str) -> 'Formula | NoReturn':
     formula = _name_check(name)
     return formula
 
+def dump_library(path: str, names: list[str] | None=None) -> None:
+    '''
+    Save named formulas into a library file.
+
+    Args:
+        path (str): The path of library file.
+        names (list[str] | None): Names of formulas to be saved, all named formulas by default.
+    
+    Raises:
+        ValueError: No such a formula named..., or a formula cannot be serialized.
+    '''
+    if names is None:
+        names = list(_named_formulas)
+    _FormulaLibrary._write(path, {name: _name_check(name).dumps() for name in names})
+
+def load_library(path: str) -> int:
+    '''
+    Open a library file, its formulas can be called or found by name.
+
+    Formulas are read from the file lazily when they are first called or found, 
+    named formulas in memory take precedence over those in libraries.
+
+    Args:
+        path (str): The path of library file.
+    
+    Returns:
+        int: Count of formulas in the library.
+    
+    Raises:
+        ValueError: The file is not a formula library.
+    '''
+    library: _FormulaLibrary = _FormulaLibrary(path)
+    _libraries.append(library)
+    return len(library)
+
 class Formula:
     '''
     Math expression with arguments.
@@ -116,6 +207,275 @@ class Formula:
         '''
         return self._formula._curry(**kwargs)
 
+    def cache(self, enable: bool=True) -> None:
+        '''
+        Cache values of the expressions substituted from formula.
+
+        At most "config.EXPRESSION_MAX_CACH" values are kept, the least recently used one is dropped first.
+        Formulas with random functions(Math.rand, Math.choose, etc.) are never cached.
+
+        Args:
+            enable (bool): Enable caching, or disable it and clear the cache.
+        '''
+        self._formula._cache_values(enable)
+
+    def cache_info(self) -> dict[str, int]:
+        '''
+        Statistics of the value cache of formula.
+
+        Returns:
+            dict: "hits", "misses", current "size" and "maxsize" of cache, all of them are 0 if caching is not enabled.
+        '''
+        return self._formula._cache_info()
+
+    def simplify(self) -> 'Formula':
+        '''
+        Fold constant parts of formula and remove identities such as x*1, x+0 and x**1.
+
+        An identity is only removed where it cannot change the value or its type, such as
+        x*1 where x may be a bool or a complex number, so values are always the same.
+
+        Set "config.AUTO_SIMPLIFY" to fold formulas while they are produced.
+
+        Returns:
+            Formula: Simplified formula, it has the same arguments.
+        '''
+        return self._formula._simplify()
+
+    def compile(self, cse: bool=True) -> Callable[..., NumericValue]:
+        '''
+        Compile formula into a single flat function.
+
+        The compiled function is also used by later substitutions, set
+        "config.AUTO_COMPILE" to compile every formula on its first substitution. 
+        Formulas deeper than "config.MAX_CLOSURE_DEPTH" are always compiled on it.
+
+        Args:
+            cse (bool): Compute each repeated subtree only once per evaluation, random functions are never merged.
+
+        Returns:
+            Callable: Function that takes the values of arguments positionally, in sorted order of their names.
+        '''
+        return self._formula._compile(cse)
+
+    def diff(self, symbol: str) -> 'Formula':
+        '''
+        Differentiate formula by an argument symbolically.
+
+        Args:
+            symbol (str): The name of argument.
+        
+        Returns:
+            Formula: Simplified derivative of formula, it has the same arguments.
+        
+        Raises:
+            ValueError: 
+                Formula has no such an argument, 
+                or formula has a function or an operator that is not differentiable(floor, branch, rand, //, etc.).
+        '''
+        return self._formula._diff(symbol)
+
+    def value_and_grad(self, **kwargs: NumericValue) -> tuple[NumericValue, dict[str, NumericValue]]:
+        '''
+        Evaluate formula and its gradient by all arguments in one forward and one backward pass.
+
+        Args:
+            **kwargs: The value of each arguments.
+        
+        Returns:
+            tuple: The value of formula, and a dict of its partial derivative by each argument.
+        
+        Raises:
+            ValueError: 
+                The given arguments does not match formula's argument set, 
+                or formula has a function or an operator that is not differentiable(floor, branch, rand, //, etc.).
+        '''
+        return self._formula._value_and_grad(**kwargs)
+
+    def profile(self, samples: Iterable[dict[str, NumericValue]], style: str='tree') -> str:
+        '''
+        Evaluate formula with a timer around every operator and function, to find the subtrees that are slow.
+
+        Every place where a subtree is used is counted separately, as closures evaluate it. 
+        "tree" shows formula as an annotated tree, a node per line with its count of calls, 
+        total and self time and count of exceptions. "collapsed" shows a line per node, 
+        with the path from the root separated by ";" and the self time in microseconds, 
+        which flamegraph tools read.
+
+        Args:
+            samples (Iterable[dict]): Sets of arguments to evaluate formula with.
+            style (str): "tree" or "collapsed".
+        
+        Returns:
+            str: The rendered profile.
+        
+        Raises:
+            ValueError: 
+                The given arguments does not match formula's argument set, 
+                or no such a style named...
+        '''
+        return self._formula._profile(samples, style)
+
+    def set_domain(self, domain: str) -> None:
+        '''
+        Choose the domain that functions of Math are evaluated in.
+
+        In "complex" domain, the default, functions bound to cmath(sqrt, log, sin, hypot, etc.) 
+        return complex numbers. In "real" domain they return real numbers for real arguments, 
+        and complex numbers only for arguments out of their real domains(sqrt of negative 
+        numbers, asin of numbers greater than 1, etc.). "config.REAL_DOMAIN" makes "real" the 
+        domain of new formulas. Formulas derived from formula(curry, simplify, diff) keep its domain.
+
+        Args:
+            domain (str): "complex" or "real".
+        
+        Raises:
+            ValueError: No such a domain named...
+        '''
+        self._formula._set_domain(domain)
+
+    def set_backend(self, backend: str, cse: bool=True) -> None:
+        '''
+        Choose how substitutions of formula are evaluated.
+
+        "closure" calls the chain of closures built with formula, it is the default.
+        "compiled" calls the function compiled by "Formula.compile".
+        "vm" runs a postfix program of formula on a value stack, which needs no function objects.
+        Formulas deeper than "config.MAX_CLOSURE_DEPTH" are compiled instead of using closures.
+
+        Args:
+            backend (str): "closure", "compiled" or "vm".
+            cse (bool): Compute each repeated subtree only once per evaluation, random functions are never merged.
+        
+        Raises:
+            ValueError: No such a backend named...
+        '''
+        self._formula._set_backend(backend, cse)
+
+    def cse_stats(self) -> dict[str, int]:
+        '''
+        Statistics of common subexpression elimination of the compiled formula, the formula is compiled if it is not.
+
+        Returns:
+            dict: "nodes" is the count of operators and functions in formula, 
+                "evaluated" is how many of them are computed per evaluation, 
+                "deduplicated" is how many are saved.
+        '''
+        self._formula._compiled_functions(self._formula._cse)
+        return self._formula._stats.copy()
+
+    def evaluate_batch(self, **kwargs: Any) -> Any:
+        '''
+        Evaluate formula over arrays of arguments at once, numpy is required.
+
+        Args:
+            **kwargs: The arrays(or scalars) of each arguments, they are broadcast against each other.
+        
+        Returns:
+            numpy.ndarray: The values of formula at every point.
+        
+        Raises:
+            ValueError: The given arguments does not match formula's argument set.
+            ImportError: numpy is not installed.
+        '''
+        return self._formula._evaluate_batch(**kwargs)
+
+    def map(self, kwargs_iterable: Iterable[dict[str, NumericValue]], workers: int | None=None, chunk_size: int=1024) -> Iterator[NumericValue]:
+        '''
+        Evaluate formula over many sets of arguments with multiple processes.
+
+        Inputs that fit in a single chunk are evaluated in the current process.
+        Math functions defined by "Math.define" must also be defined in worker processes.
+
+        Args:
+            kwargs_iterable (Iterable[dict]): The values of arguments of every evaluation, consumed lazily.
+            workers (int | None): Count of worker processes, the count of CPUs by default.
+            chunk_size (int): Count of evaluations sent to a worker at a time.
+        
+        Returns:
+            Iterator: The values of formula, in the same order as the given arguments.
+        
+        Raises:
+            ValueError: chunk_size is not positive, formula has a function that cannot be serialized, 
+                or arguments do not match.
+        '''
+        return self._formula._map(kwargs_iterable, workers, chunk_size)
+
+    def stream(self, iterable: Iterable[dict[str, NumericValue] | tuple[NumericValue, ...]], chunk_size: int | None=None) -> Iterator[NumericValue]:
+        '''
+        Evaluate formula over a stream of arguments lazily, without creating expressions.
+
+        Formula is compiled before the stream starts. Values do not depend on chunk_size, 
+        but numbers of a chunk have one type, so ints in a chunk with floats are floats 
+        and reals in a chunk with complex numbers are complex.
+
+        Args:
+            iterable (Iterable[dict | tuple]): Values of arguments, as dicts or as tuples in the order of sorted argument names.
+            chunk_size (int | None): Evaluate this many items at a time with numpy arrays, every item is evaluated by itself if it is None.
+        
+        Returns:
+            Iterator: The values of formula, in the same order as the given arguments.
+        
+        Raises:
+            ValueError: chunk_size is not positive.
+        '''
+        return self._formula._stream(iterable, chunk_size)
+
+    def dumps(self) -> bytes:
+        '''
+        Serialize formula into bytes.
+
+        Returns:
+            bytes: Serialized formula, it can be loaded by "Formula.loads".
+        
+        Raises:
+            ValueError: Formula has a function or a value that cannot be serialized.
+        '''
+        return self._formula._dumps()
+
+    @staticmethod
+    def loads(data: bytes | memoryview, name: str | None=None) -> 'Formula':
+        '''
+        Load a formula from bytes.
+
+        Math functions defined by "Math.define" must be defined before loading.
+
+        Args:
+            data (bytes | memoryview): Serialized formula.
+            name (str | None): Name of the loaded formula.
+        
+        Returns:
+            Formula: The loaded formula.
+        
+        Raises:
+            ValueError: Data is not a serialized formula, or has an undefined function.
+        '''
+        tree, args = _TreeSerializer._decode(data)
+        formula: Formula = Formula(_Productor._rebuild(tree), name)
+        formula._formula._args = args
+        return formula
+
+    @staticmethod
+    def parse(text: str, name: str | None=None) -> 'Formula':
+        '''
+        Parse a formula from text, such as "2*x-1 + sin(y)".
+
+        Operators have the same precedence as they have in formulas, functions are 
+        the math functions of Math, named as "Formula.text" shows them.
+
+        Args:
+            text (str): The text of formula.
+            name (str | None): Name of the parsed formula.
+        
+        Returns:
+            Formula: The parsed formula.
+        
+        Raises:
+            ValueError: The text is not a valid formula, or has an undefined function.
+        '''
+        tree: _Tree._ProductionTree = _FormulaParser(text)._parse()
+        return Formula(_Productor._rebuild(tree), name)
+
     def text(self) -> str:
         '''
         Represent formula mathematically.
@@ -197,9 +557,9 @@ class Expression:
     def __init__(self, production: _Production) -> None: ...
     
     @overload
-    def __init__(self, _func: Callable[[dict], NumericValue], _exp: str, _kwargs: dict[str, NumericValue]) -> None: ...
+    def __init__(self, _func: Callable[[dict], NumericValue], _exp: str | tuple[str, ...], _kwargs: dict[str, NumericValue]) -> None: ...
     
-    def __init__(self, production: _Production=None, _func: Callable[[dict], NumericValue]=None, _exp: str=None, _kwargs: dict[str, NumericValue]=None) -> None:
+    def __init__(self, production: _Production=None, _func: Callable[[dict], NumericValue]=None, _exp: str | tuple[str, ...]=None, _kwargs: dict[str, NumericValue]=None) -> None:
         if production is None and \
         _func is not None and \
         _exp is not None and \
@@ -210,12 +570,13 @@ class Expression:
         _func is None and \
         _exp is None and \
         _kwargs is None:
-            _unlock(production)
-            if production._args == set():
+            _func, tree, args = _get_production_attributes(production)
+            if args == set():
                 self._production: _Production = production
-                _func: Callable[[dict], NumericValue] = self._production._func
-                _exp: str = _TreeParser._get_tree_str(self._production._tree)
+                _exp: str = _TreeParser._get_tree_str(tree)
                 _kwargs: dict[str, NumericValue] = {}
+                if tree._depth > config.MAX_CLOSURE_DEPTH:
+                    _func = _Compiler(tree, args)._compile()[1]
                 self._expression: _Expression = _Expression(_func, _exp, _kwargs)
             else:
                 raise ValueError('Arguments cannot be carried in expression production.')
@@ -301,46 +662,70 @@ class Expression:
 class _TreeParser:
 
     @staticmethod
-    def _get_tree_str(tree: _Tree._ProductionTree, parent_level: int=0) -> str:
-        if isinstance(tree, _Tree._NumericProductionTree):
-            return str(tree._value)
-        if isinstance(tree, _Tree._SymbolProductionTree):
-            return f'{SIGN_CH_L}{tree._sign}{SIGN_CH_R}'
-        if isinstance(tree, _Tree._FunctionProductionTree):
-            return _TreeParser._get_func_tree_str(tree)
-        if isinstance(tree, _Tree._OperatorProductionTree1E):
-            return _TreeParser._get_ovl_tree_str(tree)
-        if isinstance(tree, _Tree._OperatorProductionTree2E):
-            return _TreeParser._get_lor_tree_str(tree, parent_level)
-        raise ValueError(f'Bad tree was given')
+    def _get_text_template(tree_str: str) -> tuple[str, ...]:
+        pattern: str = f'{re.escape(SIGN_CH_L)}(.*?){re.escape(SIGN_CH_R)}'
+        return tuple(re.split(pattern, tree_str))
 
     @staticmethod
-    def _get_func_tree_str(tree: _Tree._FunctionProductionTree) -> str:
-        args: list[str] = []
-        for subtree in tree._args:
-            arg: str = _TreeParser._get_tree_str(subtree, tree._level)
-            args.append(arg)
-        func_text: str = tree._operator
-        args_text: str = ''.join((f'{item}, ' for item in args if item)).removesuffix(', ')
-        return f'{func_text}({args_text})'
+    def _get_tree_str(tree: _Tree._ProductionTree) -> str:
+        # pending items are literal texts, or nodes with the level of their parents
+        parts: list[str] = []
+        stack: list[str | tuple[_Tree._ProductionTree, int]] = [(tree, 0)]
+        while stack:
+            item: str | tuple[_Tree._ProductionTree, int] = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+                continue
+            node, parent_level = item
+            if isinstance(node, _Tree._NumericProductionTree):
+                parts.append(_TreeParser._get_numeric_text(node._value, parent_level))
+            elif isinstance(node, _Tree._SymbolProductionTree):
+                parts.append(f'{SIGN_CH_L}{node._sign}{SIGN_CH_R}')
+            elif isinstance(node, _Tree._FunctionProductionTree):
+                stack.extend(_TreeParser._get_func_tree_items(node))
+            elif isinstance(node, _Tree._OperatorProductionTree1E):
+                stack.extend((')', (node._value, node._level), f'({node._operator}'))
+            elif isinstance(node, _Tree._OperatorProductionTree2E):
+                stack.extend(_TreeParser._get_lor_tree_items(node, parent_level))
+            else:
+                raise ValueError(f'Bad tree was given')
+        return ''.join(parts)
 
     @staticmethod
-    def _get_ovl_tree_str(tree: _Tree._OperatorProductionTree1E) -> str:
-        value_str: str = _TreeParser._get_tree_str(tree._value, tree._level)
-        return f'({tree._operator}{value_str})'
+    def _get_numeric_text(value: NumericValue, parent_level: int) -> str:
+        # the sign of a negative number binds looser than "**"(-2**x is -(2**x)), so it is
+        # parenthesized as an operand of "**", complex numbers are already parenthesized by str
+        text: str = str(value)
+        if parent_level > 12 and text.startswith('-'):
+            return f'({text})'
+        return text
 
     @staticmethod
-    def _get_lor_tree_str(tree: _Tree._OperatorProductionTree2E, parent_level: int) -> str:
-        l_subtree_str: str = _TreeParser._get_tree_str(tree._value1, tree._level)
-        r_subtree_str: str = _TreeParser._get_tree_str(tree._value2, tree._level)
-        l_filler, r_filler = ('(', ')') if parent_level > tree._level else ('', '')
-        return f'{l_filler}{l_subtree_str}{tree._operator}{r_subtree_str}{r_filler}'
+    def _get_func_tree_items(tree: _Tree._FunctionProductionTree) -> list[str | tuple[_Tree._ProductionTree, int]]:
+        # in reversed order, as they are pushed onto the stack
+        items: list[str | tuple[_Tree._ProductionTree, int]] = [')']
+        for index in range(len(tree._args) - 1, -1, -1):
+            items.append((tree._args[index], tree._level))
+            if index:
+                items.append(', ')
+        items.append(f'{tree._operator}(')
+        return items
+
+    @staticmethod
+    def _get_lor_tree_items(tree: _Tree._OperatorProductionTree2E, parent_level: int) -> list[str | tuple[_Tree._ProductionTree, int]]:
+        # in reversed order, as they are pushed onto the stack
+        # an operand on the non-associative side is parenthesized at the same level too,
+        # "**" is right associative and the others are left associative
+        left_level, right_level = (tree._level + 1, tree._level) if tree._operator == '**' else (tree._level, tree._level + 1)
+        items: list[str | tuple[_Tree._ProductionTree, int]] = [(tree._value2, right_level), tree._operator, (tree._value1, left_level)]
+        if parent_level > tree._level:
+            items = [')', *items, '(']
+        return items
 
 class _Formula:
 
     def __init__(self, production: _Production | NumericValue) -> None:
         self._production: _Production | NumericValue = production
-        _unlock(self._production)
         if not isinstance(self._production, _Production):
             if isinstance(self._production, NumericValue):
                 self._func: Callable[[dict], NumericValue] = lambda _: self._production
@@ -349,58 +734,200 @@ class _Formula:
             else:
                 raise TypeError(f'Formula() argument must be a Production or NumericValue, not \'{type(production)}\'')
         else:
-            self._func: Callable[[dict], NumericValue] = self._production._func
-            self._tree: _Tree._ProductionTree = self._production._tree
-            self._args: set[str] = self._production._args
-        self._tree_str: str = _TreeParser._get_tree_str(self._tree)
-        _relock(self._production)
+            self._func, self._tree, self._args = _get_production_attributes(self._production)
+        # text is built on demand, composing formulas does not render intermediate ones
+        self._tree_str: str | None = None
+        self._template: tuple[str, ...] | None = None
+        self._closure: Callable[[dict], NumericValue] = self._func
+        self._backend: str = 'closure'
+        self._compiled: Callable[..., NumericValue] | None = None
+        self._compiled_keyword: Callable[[dict], NumericValue] | None = None
+        self._compiled_cse: bool = True
+        self._cse: bool = True
+        self._stats: dict[str, int] = {}
+        self._cache: _ExpressionCache | None = None
+        self._gradient: Callable[[dict], tuple[NumericValue, dict[str, NumericValue]]] | None = None
+        self._domain: str = 'complex'
+        self._real_domain_tree: _Tree._ProductionTree | None = None
+        self._real_closure: Callable[[dict], NumericValue] | None = None
+        if config.REAL_DOMAIN:
+            # closures of the real domain are built on the first evaluation
+            self._domain, self._func = 'real', None
     
     def _subs(self, **kwargs: NumericValue) -> Expression:
         args: set[str] = set(kwargs)
         if args != self._args:
             raise ValueError(f'arguments do not match')
-        return Expression(None, self._func, self._tree_str, kwargs)
+        func: Callable[[dict], NumericValue] = self._evaluator() if self._cache is None else self._cache
+        return Expression(None, func, self._get_template(), kwargs)
+
+    def _evaluator(self) -> Callable[[dict], NumericValue]:
+        # nested closures of a deep tree would exceed the recursion limit, a compiled
+        # formula is evaluated in one flat function whatever its depth is
+        if self._backend == 'closure' and (config.AUTO_COMPILE or self._tree._depth > config.MAX_CLOSURE_DEPTH):
+            self._compile(self._cse)
+        elif self._func is None:
+            self._func = self._closure_function()
+        return self._func
+
+    def _evaluation_tree(self) -> _Tree._ProductionTree:
+        # the tree that evaluators are built from, text and serialization use the original tree
+        if self._domain == 'complex':
+            return self._tree
+        if self._real_domain_tree is None:
+            self._real_domain_tree = _real_tree(self._tree)
+        return self._real_domain_tree
+
+    def _closure_function(self) -> Callable[[dict], NumericValue]:
+        if self._domain == 'complex':
+            return self._closure
+        if self._real_closure is None:
+            self._real_closure = _get_production_attributes(_Productor._rebuild(self._evaluation_tree()))[0]
+        return self._real_closure
+
+    def _set_domain(self, domain: str) -> None:
+        if domain not in ('complex', 'real'):
+            raise ValueError(f'No such a domain named {domain}')
+        if domain == self._domain:
+            return
+        self._domain = domain
+        self._compiled = self._compiled_keyword = self._gradient = None
+        if self._cache is not None:
+            self._cache = None
+            self._cache_values(True)
+        self._set_backend(self._backend, self._cse)
+
+    def _derive(self, tree: _Tree._ProductionTree, args: set[str]) -> Formula:
+        # a formula of the tree with the arguments and the domain of this formula
+        formula: Formula = Formula(_Productor._rebuild(tree))
+        formula._formula._args = args
+        formula._formula._set_domain(self._domain)
+        return formula
+
+    def _get_tree_str(self) -> str:
+        if self._tree_str is None:
+            self._tree_str = _TreeParser._get_tree_str(self._tree)
+        return self._tree_str
+
+    def _get_template(self) -> tuple[str, ...]:
+        if self._template is None:
+            self._template = _TreeParser._get_text_template(self._get_tree_str())
+        return self._template
+
+    def _cache_values(self, enable: bool) -> None:
+        if enable and self._tree._deterministic:
+            if self._cache is None:
+                self._cache = _ExpressionCache(self._evaluator, self._args, config.EXPRESSION_MAX_CACH)
+        else:
+            self._cache = None
+
+    def _cache_info(self) -> dict[str, int]:
+        if self._cache is None:
+            return {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 0}
+        return self._cache._info()
+
+    def _call_many(self, kwargs_list: list[dict[str, NumericValue]]) -> list[NumericValue]:
+        for kwargs in kwargs_list:
+            if kwargs.keys() != self._args:
+                raise ValueError(f'arguments do not match')
+        func: Callable[[dict], NumericValue] = self._evaluator() if self._cache is None else self._cache
+        return [func(kwargs) for kwargs in kwargs_list]
+
+    def _map(self, kwargs_iterable: Iterable[dict[str, NumericValue]], workers: int | None, chunk_size: int) -> Iterator[NumericValue]:
+        evaluator: _ParallelEvaluator = _ParallelEvaluator(self._tree, self._args, self._evaluator(), workers, chunk_size, self._domain == 'real')
+        return evaluator._map(kwargs_iterable)
+
+    def _stream(self, iterable: Iterable[dict[str, NumericValue] | tuple[NumericValue, ...]], chunk_size: int | None) -> Iterator[NumericValue]:
+        positional, keyword = self._compiled_functions(self._cse)
+        evaluator: _StreamEvaluator = _StreamEvaluator(self._tree, self._args, positional, keyword, chunk_size, self._domain == 'real')
+        return evaluator._stream(iterable)
+
+    def _dumps(self) -> bytes:
+        return _TreeSerializer._encode(self._tree, self._args)
+
+    def _simplify(self) -> Formula:
+        tree: _Tree._ProductionTree = _Simplifier(self._domain == 'real')._simplify(self._tree)
+        return self._derive(tree, self._args)
+
+    def _diff(self, symbol: str) -> Formula:
+        if symbol not in self._args:
+            raise ValueError(f'arguments do not match')
+        tree: _Tree._ProductionTree = _Simplifier(self._domain == 'real')._simplify(_Differentiator(symbol)._differentiate(self._tree))
+        return self._derive(tree, self._args)
+
+    def _value_and_grad(self, **kwargs: NumericValue) -> tuple[NumericValue, dict[str, NumericValue]]:
+        if set(kwargs) != self._args:
+            raise ValueError(f'arguments do not match')
+        if self._gradient is None:
+            self._gradient = _GradientCompiler(self._tree, self._args)._compile_gradient(self._domain == 'real')
+        return self._gradient(kwargs)
+
+    def _profile(self, samples: Iterable[dict[str, NumericValue]], style: str) -> str:
+        if style not in ('tree', 'collapsed'):
+            raise ValueError(f'No such a style named {style}')
+        profiler: _Profiler = _Profiler(self._evaluation_tree(), self._args)
+        profiler._profile(samples)
+        return profiler._render_tree() if style == 'tree' else profiler._render_collapsed()
+
+    def _compile(self, cse: bool=True) -> Callable[..., NumericValue]:
+        positional, self._func = self._compiled_functions(cse)
+        self._backend, self._cse = 'compiled', cse
+        return positional
+
+    def _compiled_functions(self, cse: bool) -> tuple[Callable[..., NumericValue], Callable[[dict], NumericValue]]:
+        if self._compiled is None or self._compiled_cse != cse:
+            compiler: _Compiler = _Compiler(self._evaluation_tree(), self._args, cse)
+            self._compiled, self._compiled_keyword = compiler._compile()
+            self._compiled_cse, self._stats = cse, compiler._stats()
+        return self._compiled, self._compiled_keyword
+
+    def _set_backend(self, backend: str, cse: bool) -> None:
+        match backend:
+            case 'closure':
+                self._func, self._backend = self._closure_function(), backend
+            case 'compiled':
+                self._compile(cse)
+            case 'vm':
+                self._func, self._backend = _VirtualMachine(self._evaluation_tree(), self._args, cse)._run, backend
+            case _:
+                raise ValueError(f'No such a backend named {backend}')
+        self._cse = cse
+
+    def _evaluate_batch(self, **kwargs: Any) -> Any:
+        if set(kwargs) != self._args:
+            raise ValueError(f'arguments do not match')
+        return _BatchEvaluator(self._tree, self._domain == 'real')._evaluate(kwargs)
 
     # def _draw(self, range_: tuple):
     #     Draw._drawer._add_func(self, range_)
 
     def _curry(self, **kwargs: dict[str, NumericValue]) -> Formula:
-        args: set[str] = self._args.copy()
-        tree: _Tree._ProductionTree = self._tree_curry(self._tree, kwargs)
-        for key in kwargs:
+        args: set[str] = set(self._args)
+        for key, value in kwargs.items():
             if key not in args:
                 raise ValueError(f'arguments do not match')
+            if not isinstance(value, NumericValue):
+                raise ValueError(f'{key} must be a NumericValue, not \'{type(value)}\'')
             args.remove(key)
 
-        def wapper(kwargs_: dict[str, NumericValue]) -> NumericValue:
-            for key in kwargs:
-                kwargs_[key] = kwargs[key]
-            return self._func(kwargs_)
-        
-        return Formula(_Production(wapper, tree, args))
+        # the evaluator is rebuilt from the curried tree, so the bound values are
+        # inlined as constants and folded instead of being passed on every call
+        tree: _Tree._ProductionTree = _Simplifier(self._domain == 'real')._simplify(self._tree_curry(self._tree, kwargs))
+        formula: Formula = self._derive(tree, args)
+        if self._backend != 'closure':
+            formula._formula._set_backend(self._backend, self._cse)
+        return formula
     
     def _tree_curry(self, tree: _Tree._ProductionTree, kwargs: dict[str, NumericValue]) -> _Tree._ProductionTree:
-        if isinstance(tree, _Tree._SymbolProductionTree):
-            if tree._sign in kwargs.keys():
-                return _Tree._NumericProductionTree(kwargs[tree._sign])
-            return _Tree._SymbolProductionTree(tree._sign)
-        
-        if isinstance(tree, _Tree._FunctionProductionTree):
-            args: list[_Tree._ProductionTree] = []
-            for arg in tree._args:
-                args.append(self._tree_curry(arg, kwargs))
-            return _Tree._FunctionProductionTree(tree._operator, args)
-        
-        if isinstance(tree, _Tree._OperatorProductionTree1E):
-            return _Tree._OperatorProductionTree1E(tree._operator, self._tree_curry(tree._value), tree._level)
-        if isinstance(tree, _Tree._OperatorProductionTree2E):
-            return _Tree._OperatorProductionTree2E(tree._operator, self._tree_curry(tree._value1), self._tree_curry(tree._value2), tree._level)
-        if isinstance(tree, _Tree._NumericProductionTree):
-            return _Tree._NumericProductionTree(tree._value)
-        raise ValueError('Bad tree was given.')
+        return _Tree._walk(tree, lambda node, children: self._curry_node(node, children, kwargs), {})
+
+    def _curry_node(self, tree: _Tree._ProductionTree, children: list[_Tree._ProductionTree], kwargs: dict[str, NumericValue]) -> _Tree._ProductionTree:
+        if isinstance(tree, _Tree._SymbolProductionTree) and tree._sign in kwargs:
+            return _Tree._NumericProductionTree(kwargs[tree._sign])
+        return _Tree._replace(tree, children)
     
     def _text(self) -> str:
-        tree_text: str = self._tree_str.replace(SIGN_CH_L, '').replace(SIGN_CH_R, '')
+        tree_text: str = self._get_tree_str().replace(SIGN_CH_L, '').replace(SIGN_CH_R, '')
         return tree_text
 
     def __str__(self) -> str:
@@ -460,8 +987,10 @@ class _Formula:
 
 class _Expression:
 
-    def __init__(self, func: Callable[[dict], NumericValue], exp: str, kwargs: dict[str, NumericValue]) -> None:
-        self._expression_text_with_signs: str = exp
+    def __init__(self, func: Callable[[dict], NumericValue], exp: str | tuple[str, ...], kwargs: dict[str, NumericValue]) -> None:
+        # literal fragments at even indices, symbols at odd indices
+        self._template: tuple[str, ...] = exp if isinstance(exp, tuple) else _TreeParser._get_text_template(exp)
+        self._expression_text: str | None = None
         self._kwargs: dict[str, NumericValue] = kwargs
         self._func: Callable[[dict], NumericValue] = func
         # self._tree: _Tree._ProductionTree = self._tree_subs(tree, kwargs)
@@ -489,26 +1018,18 @@ class _Expression:
     #             return tree
     
     def _text(self) -> str:
-        expression_text: str = ''
-        pos: int = 0
-        while pos < len(self._expression_text_with_signs):
-            char = self._expression_text_with_signs[pos]
-            if char != SIGN_CH_L:
-                expression_text += char
-            else:
-                left: int = pos + 1
-                while self._expression_text_with_signs[pos] != SIGN_CH_R:
-                    pos += 1
-                right: int = pos
-                symbol: str = self._expression_text_with_signs[left:right]
-                arg_value: NumericValue = self._kwargs[symbol]
-                value_str: str = str(arg_value)
-                is_negative: bool = (not isinstance(arg_value, complex)) and arg_value < 0
-                if is_negative:
-                    value_str = f'({value_str})'
-                expression_text += value_str
-            pos += 1
-        return expression_text
+        if self._expression_text is None:
+            parts: list[str] = list(self._template)
+            for index in range(1, len(parts), 2):
+                parts[index] = _Expression._value_text(self._kwargs[parts[index]])
+            self._expression_text = ''.join(parts)
+        return self._expression_text
+
+    @staticmethod
+    def _value_text(value: NumericValue) -> str:
+        if not isinstance(value, complex) and value < 0:
+            return f'({value})'
+        return str(value)
 
     def __str__(self) -> str:
         fargs = [f'{key}={self._kwargs[key]}, ' for key in self._kwargs]
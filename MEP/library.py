@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+
+import mmap
+import struct
+
+
+_MAGIC: bytes = b'MEPL'
+_VERSION: int = 1
+
+# magic, version, count of formulas
+_HEADER: struct.Struct = struct.Struct('<4sB3xQ')
+# offset and size of name, offset and size of serialized formula
+_ENTRY: struct.Struct = struct.Struct('<QIQI')
+
+
+class _FormulaLibrary:
+    '''
+    A file of named serialized formulas, read through a memory map.
+
+    The header is followed by one fixed-size entry per formula, sorted by name, and
+    then by the names and serialized formulas themselves. A formula is found by
+    binary search over the entries, so opening a library reads nothing up front.
+    '''
+
+    @staticmethod
+    def _write(path: str, formulas: dict[str, bytes]) -> None:
+        names: list[bytes] = sorted(name.encode() for name in formulas)
+        offset: int = _HEADER.size + _ENTRY.size * len(names)
+        entries: bytearray = bytearray(_HEADER.pack(_MAGIC, _VERSION, len(names)))
+        data: bytearray = bytearray()
+        for name in names:
+            formula: bytes = formulas[name.decode()]
+            entries += _ENTRY.pack(offset, len(name), offset + len(name), len(formula))
+            data += name + formula
+            offset += len(name) + len(formula)
+        with open(path, 'wb') as file:
+            file.write(entries)
+            file.write(data)
+
+    def __init__(self, path: str) -> None:
+        with open(path, 'rb') as file:
+            self._map: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _HEADER.size:
+            raise ValueError(f'{path} is not a formula library')
+        magic, version, self._count = _HEADER.unpack_from(self._map)
+        if magic != _MAGIC:
+            raise ValueError(f'{path} is not a formula library')
+        if version != _VERSION:
+            raise ValueError(f'Unsupported version {version} of formula library')
+        if self._count > (len(self._map) - _HEADER.size) // _ENTRY.size:
+            raise ValueError(f'{path} is a truncated formula library')
+        self._view: memoryview = memoryview(self._map)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, index: int) -> tuple[bytes, int, int]:
+        name_offset, name_size, offset, size = _ENTRY.unpack_from(self._map, _HEADER.size + _ENTRY.size * index)
+        if name_offset + name_size > len(self._map) or offset + size > len(self._map):
+            raise ValueError(f'Bad entry {index} of formula library was given.')
+        return self._map[name_offset:name_offset + name_size], offset, size
+
+    def _get(self, name: str) -> memoryview | None:
+        key: bytes = name.encode()
+        low, high = 0, self._count
+        while low < high:
+            middle: int = (low + high) // 2
+            entry_name, offset, size = self._entry(middle)
+            if entry_name == key:
+                return self._view[offset:offset + size]
+            if entry_name < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
@@ -7,7 +7,7 @@ import random
 from typing import Callable, TypeAlias
 from enum import Enum
 
-from .production import _Production, _relock, _unlock, NumericValue, _Tree
+from .production import _Production, _Productor, _get_production_attributes, _intern_production, NumericValue, _Tree, _functions, _lazy_functions, _nondeterministic_functions
 
 from .formula import Formula
 
@@ -15,6 +15,8 @@ from .formula import Formula
 Real: TypeAlias = int | float | bool
 Calculable: TypeAlias = _Production | Formula | NumericValue
 
+_number_types: frozenset[type] = frozenset({int, float, complex, bool})
+
 class _ArgsType(Enum):
     ALLNUM = 'allnum'
     PRODUCTION = 'production'
@@ -44,34 +46,28 @@ class _Constructor:
     @staticmethod
     def _construct_production(func: Callable[[NumericValue], NumericValue], args: tuple[_Production | NumericValue], func_name: str) -> _Production:
         args_: set[str] = set()
-        funcs: dict[int, Callable[[dict], NumericValue]] = {}
-        trees: dict[int, _Tree._ProductionTree] = {}
-        _unlock(*args)
-        for index, arg in enumerate(args):
+        funcs: list[Callable[[dict], NumericValue] | None] = []
+        trees: list[_Tree._ProductionTree] = []
+        for arg in args:
             if isinstance(arg, _Production):
-                funcs[index] = arg._func
-                trees[index] = arg._tree
-                args_ |= arg._args
-
-        construced_func: Callable[[dict], NumericValue] = lambda kwargs: func(
-            *[f(kwargs) if (f := funcs.get(index)) else args[index]
-            for index in range(len(args))])
-
-        func_tree: _Tree._FunctionProductionTree = _Tree._FunctionProductionTree(func_name, 
-            *[t if (t := trees.get(index)) else _Tree._NumericProductionTree(args[index]) 
-            for index in range(len(args))])
-        _relock(*args)
+                arg_func, arg_tree, arg_args = _get_production_attributes(arg)
+                funcs.append(arg_func)
+                trees.append(arg_tree)
+                args_ |= arg_args
+            else:
+                funcs.append(None)
+                trees.append(_Tree._NumericProductionTree(arg))
 
-        return _Production(construced_func, func_tree, args_)
+        func_tree: _Tree._FunctionProductionTree = _Tree._FunctionProductionTree(func_name, *trees, func=func)
+        return _Productor._reuse(func_tree) or _intern_production(
+            _Production(_Productor._function_evaluator(func, args, funcs), func_tree, args_))
 
     @staticmethod
     def _construct_formula(args: tuple[Calculable], wrapper: Callable[[Calculable], Calculable]) -> Formula:
         productions: dict[int, NumericValue | _Production] = {}
-        _unlock(*args)
         for index, arg in enumerate(args):
             if isinstance(arg, Formula):
                 productions[index] = arg._formula._production
-        _relock(*args)
 
         funcs: list[NumericValue | _Production] = [productions[index] if isinstance(arg, Formula) else arg
             for index, arg in enumerate(args)]
@@ -79,8 +75,25 @@ class _Constructor:
         return Formula(production)
 
     @staticmethod
-    def _func_construct_wrapper(func: Callable[[NumericValue], NumericValue], func_name: str) -> Callable[[Calculable], Calculable]:
+    def _func_construct_wrapper(func: Callable[[NumericValue], NumericValue], func_name: str, deterministic: bool=True) -> Callable[[Calculable], Calculable]:
+        _functions[func_name] = func
+        if not deterministic:
+            _nondeterministic_functions.add(func)
         def wrapper(*args: Calculable) -> Calculable:
+            # numbers of the builtin types are passed to the function without scanning the arguments
+            count: int = len(args)
+            if count == 1:
+                if type(args[0]) in _number_types:
+                    return func(args[0])
+            elif count == 2:
+                if type(args[0]) in _number_types and type(args[1]) in _number_types:
+                    return func(args[0], args[1])
+            else:
+                for arg in args:
+                    if type(arg) not in _number_types:
+                        break
+                else:
+                    return func(*args)
             match _Constructor._args_type_check(args):
                 case _ArgsType.ALLNUM:
                     return func(*args)
@@ -136,20 +149,21 @@ class Math:
     '''
 
     @staticmethod
-    def define(func: Callable[[NumericValue], NumericValue], name: str) -> None:
+    def define(func: Callable[[NumericValue], NumericValue], name: str, deterministic: bool=True) -> None:
         '''
         Define a new math function.
 
         Args:
             func (Callable): the core of new function.
             name (str): the name of new function.
+            deterministic (bool): False if the function may return different values for the same arguments.
         
         Raises:
             ValueError:
-                ... is already a function of Math.
+                ... is already a function of Math, or the name of one in formulas, such as "int" of "Math.toint".
         '''
-        if name not in Math.__dict__:
-            setattr(Math, name, _Constructor._func_construct_wrapper(func, name))
+        if name not in Math.__dict__ and name not in _functions:
+            setattr(Math, name, _Constructor._func_construct_wrapper(func, name, deterministic))
         else:
             raise ValueError(f'{name} is already a function of Math.')
     
@@ -208,7 +222,7 @@ class Math:
     degtorad = _Constructor._func_construct_wrapper(lambda x: 180 / cmath.pi * x, 'dtr')
     gradtorad = _Constructor._func_construct_wrapper(lambda x: 240 / cmath.pi * x, 'gtr')
     degtograd = _Constructor._func_construct_wrapper(lambda x: x * (360 / 400), 'dtg')
-    radtograd = _Constructor._func_construct_wrapper(lambda x: cmath.pi / 240 * x, 'rtd')
+    radtograd = _Constructor._func_construct_wrapper(lambda x: cmath.pi / 240 * x, 'rtg')
 
     # hyperbolic
     sinh = _Constructor._func_construct_wrapper(cmath.sinh, 'sinh')
@@ -219,9 +233,9 @@ class Math:
     atanh = _Constructor._func_construct_wrapper(cmath.atanh, 'atanh')
 
     # random
-    rand = _Constructor._func_construct_wrapper(random.randint, 'rand')
-    choose = _Constructor._func_construct_wrapper(lambda *args: random.choice(args), 'choose')
-    wchoose = _Constructor._func_construct_wrapper(_NewMathFunction.wchoose, 'wchoose')
+    rand = _Constructor._func_construct_wrapper(random.randint, 'rand', False)
+    choose = _Constructor._func_construct_wrapper(lambda *args: random.choice(args), 'choose', False)
+    wchoose = _Constructor._func_construct_wrapper(_NewMathFunction.wchoose, 'wchoose', False)
 
     # complex
     tocomplex = _Constructor._func_construct_wrapper(complex, 'complex')
@@ -239,3 +253,6 @@ class Math:
     logicnot = _Constructor._func_construct_wrapper(lambda x: not bool(x), 'not')
     logicxor = _Constructor._func_construct_wrapper(lambda x, y: (not (bool(x) and bool(y))) and (bool(x) or bool(y)), 'xor')
     branch = _Constructor._func_construct_wrapper(_NewMathFunction.branch, 'branch')
+
+# branches and logic evaluate their arguments in formulas only until the result is known
+_lazy_functions.update({_functions['branch']: 'branch', _functions['and']: 'and', _functions['or']: 'or'})
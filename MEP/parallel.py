@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+from .compiler import _Compiler
+from .production import NumericValue, _Tree
+from .real import _real_tree
+from .serializer import _TreeSerializer
+
+
+# evaluator of the formula in a worker process, built once by _initialize
+_evaluator: Callable[[dict], NumericValue] | None = None
+
+def _initialize(records: tuple[tuple, ...], params: tuple[str, ...], real: bool) -> None:
+    global _evaluator
+    tree: _Tree._ProductionTree = _TreeSerializer._loads(records)
+    if real:
+        tree = _real_tree(tree)
+    _evaluator = _Compiler(tree, set(params))._compile()[1]
+
+def _evaluate(chunk: list[dict[str, NumericValue]]) -> list[NumericValue]:
+    return [_evaluator(kwargs) for kwargs in chunk]
+
+class _ParallelEvaluator:
+    '''
+    Evaluate a formula over many argument sets with a pool of processes.
+
+    Closures cannot be pickled, so the tree is sent to every worker in serialized
+    form and compiled there once. Chunks are submitted lazily, a few per worker at a
+    time, and results are yielded in input order.
+    '''
+
+    def __init__(self, tree: _Tree._ProductionTree, args: set[str], func: Callable[[dict], NumericValue], workers: int | None, chunk_size: int, real: bool=False) -> None:
+        if chunk_size < 1:
+            raise ValueError(f'chunk_size must be positive, not {chunk_size}')
+        self._tree: _Tree._ProductionTree = tree
+        self._args: set[str] = args
+        self._params: tuple[str, ...] = tuple(sorted(args))
+        self._func: Callable[[dict], NumericValue] = func
+        self._workers: int = workers if workers is not None else (os.cpu_count() or 1)
+        self._chunk_size: int = chunk_size
+        self._real: bool = real
+
+    def _map(self, kwargs_iterable: Iterable[dict[str, NumericValue]]) -> Iterator[NumericValue]:
+        iterator: Iterator[dict[str, NumericValue]] = iter(kwargs_iterable)
+        first_chunk: list[dict[str, NumericValue]] = self._check(list(islice(iterator, self._chunk_size)))
+        if self._workers <= 1 or len(first_chunk) < self._chunk_size:
+            # too small to be worth starting processes
+            yield from map(self._func, first_chunk)
+            for kwargs in iterator:
+                yield self._func(self._check([kwargs])[0])
+            return
+
+        records: tuple[tuple, ...] = _TreeSerializer._dumps(self._tree)
+        with ProcessPoolExecutor(self._workers, initializer=_initialize, initargs=(records, self._params, self._real)) as executor:
+            pending: deque[Future] = deque([executor.submit(_evaluate, first_chunk)])
+            while pending:
+                while len(pending) < self._workers * 2:
+                    chunk: list[dict[str, NumericValue]] = self._check(list(islice(iterator, self._chunk_size)))
+                    if not chunk:
+                        break
+                    pending.append(executor.submit(_evaluate, chunk))
+                yield from pending.popleft().result()
+
+    def _check(self, chunk: list[dict[str, NumericValue]]) -> list[dict[str, NumericValue]]:
+        # arguments are checked here as "subs" does, not in the workers
+        for kwargs in chunk:
+            if kwargs.keys() != self._args:
+                raise ValueError(f'arguments do not match')
+        return chunk
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+
+import re
+from typing import Callable
+
+from . import config
+from .production import NumericValue, _Tree, _functions
+
+
+# precedence levels of operators, the same as the levels used by _Production
+_binary_levels: dict[str, int] = {
+    '**': 13,
+    '*': 11, '/': 11, '//': 11, '%': 11,
+    '+': 10, '-': 10,
+    '<<': 9, '>>': 9,
+    '&': 8,
+    '^': 7, '|': 7,
+    '==': 5, '!=': 5, '<': 5, '>': 5, '<=': 5, '>=': 5,
+}
+_unary_level: int = 12
+_right_associative: set[str] = {'**'}
+_constants: dict[str, NumericValue] = {'True': True, 'False': False, 'inf': float('inf'), 'nan': float('nan')}
+
+_NUMBER, _NAME, _OPERATOR, _END = range(4)
+_token_patterns: dict[tuple[str, str], re.Pattern] = {}
+
+
+def _token_pattern() -> re.Pattern:
+    # symbols may be wrapped by SIGN_CH_L and SIGN_CH_R, as "Formula.text" shows them
+    key: tuple[str, str] = (config.SIGN_CH_L, config.SIGN_CH_R)
+    pattern: re.Pattern | None = _token_patterns.get(key)
+    if pattern is None:
+        left, right = (f'(?:{re.escape(ch)})?' if ch else '' for ch in key)
+        pattern = _token_patterns[key] = re.compile(
+            r'\s*(?:'
+            r'(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?[jJ]?)|'
+            rf'{left}(?P<name>[A-Za-z_][A-Za-z0-9_]*){right}|'
+            r'(?P<operator>\*\*|//|<<|>>|<=|>=|==|!=|[-+*/%&^|~<>(),])'
+            r')')
+    return pattern
+
+class _FormulaParser:
+    '''
+    Parse the text of a formula into an expression tree.
+
+    An operator-precedence parser with explicit stacks of operands and pending
+    operators, so nesting is only bounded by memory. Operators bind by the precedence
+    levels of _Production and are left associative except "**". Names followed by
+    "(" are functions of Math, found by the names that "Formula.text" shows.
+    '''
+
+    def __init__(self, text: str) -> None:
+        self._tokens: list[tuple[int, str, int]] = self._tokenize(text)
+        self._values: list[_Tree._ProductionTree] = []
+        # pending operators: ('unary', operator, level), ('binary', operator, level),
+        # ('(', position) and ('call', name, func, position, count of finished arguments)
+        self._operators: list[list] = []
+
+    def _tokenize(self, text: str) -> list[tuple[int, str, int]]:
+        pattern: re.Pattern = _token_pattern()
+        tokens: list[tuple[int, str, int]] = []
+        index: int = 0
+        end: int = len(text.rstrip())
+        while index < end:
+            match: re.Match | None = pattern.match(text, index)
+            if match is None:
+                index = len(text) - len(text[index:].lstrip())
+                raise ValueError(f'invalid character {text[index]!r} at position {index}')
+            kind: str = match.lastgroup
+            tokens.append((_NUMBER if kind == 'number' else _NAME if kind == 'name' else _OPERATOR, match.group(kind), match.start(kind)))
+            index = match.end()
+        tokens.append((_END, '', end))
+        return tokens
+
+    def _parse(self) -> _Tree._ProductionTree:
+        tokens: list[tuple[int, str, int]] = self._tokens
+        index: int = 0
+        expect_operand: bool = True
+        while True:
+            kind, token, position = tokens[index]
+            index += 1
+            if expect_operand:
+                if kind == _NUMBER:
+                    self._values.append(_Tree._NumericProductionTree(self._number(token)))
+                    expect_operand = False
+                elif kind == _NAME and tokens[index][1] == '(':
+                    index += 1
+                    self._operators.append(['call', token, self._function(token, position), position, 0])
+                    if tokens[index][1] == ')':
+                        index += 1
+                        self._finish_call()
+                        expect_operand = False
+                elif kind == _NAME:
+                    self._values.append(self._name(token, position))
+                    expect_operand = False
+                elif token in ('+', '-', '~'):
+                    self._operators.append(['unary', token, _unary_level])
+                elif token == '(':
+                    self._operators.append(['(', position])
+                else:
+                    raise ValueError(f'unexpected {token!r} at position {position}' if kind != _END else 'unexpected end of formula')
+                continue
+
+            level: int | None = _binary_levels.get(token) if kind == _OPERATOR else None
+            if level is not None:
+                self._reduce(level, token in _right_associative)
+                self._operators.append(['binary', token, level])
+                expect_operand = True
+            elif token == ')':
+                self._reduce(0, False)
+                if not self._operators:
+                    raise ValueError(f'unexpected {token!r} at position {position}')
+                if self._operators[-1][0] == '(':
+                    self._operators.pop()
+                else:
+                    self._operators[-1][4] += 1
+                    self._finish_call()
+            elif token == ',':
+                self._reduce(0, False)
+                if not self._operators or self._operators[-1][0] != 'call':
+                    raise ValueError(f'unexpected {token!r} at position {position}')
+                self._operators[-1][4] += 1
+                expect_operand = True
+            elif kind == _END:
+                self._reduce(0, False)
+                if self._operators:
+                    raise ValueError(f'expected \')\' at position {position}')
+                return self._values[-1]
+            else:
+                raise ValueError(f'unexpected {token!r} at position {position}')
+
+    def _reduce(self, level: int, right_associative: bool) -> None:
+        # apply pending operators that bind tighter than an operator of the level
+        operators: list[list] = self._operators
+        values: list[_Tree._ProductionTree] = self._values
+        while operators:
+            if operators[-1][0] not in ('unary', 'binary'):
+                return
+            kind, operator, top_level = operators[-1]
+            if top_level < level or (top_level == level and right_associative):
+                return
+            operators.pop()
+            if kind == 'unary':
+                values.append(_Tree._OperatorProductionTree1E(operator, values.pop(), top_level))
+            else:
+                right: _Tree._ProductionTree = values.pop()
+                values.append(_Tree._OperatorProductionTree2E(operator, values.pop(), right, top_level))
+
+    def _finish_call(self) -> None:
+        _, name, func, _, count = self._operators.pop()
+        args: list[_Tree._ProductionTree] = self._values[len(self._values) - count:]
+        del self._values[len(self._values) - count:]
+        self._values.append(_Tree._FunctionProductionTree(name, *args, func=func))
+
+    def _number(self, token: str) -> NumericValue:
+        if token[-1] in 'jJ':
+            return complex(token)
+        if any(ch in token for ch in '.eE'):
+            return float(token)
+        return int(token)
+
+    def _name(self, token: str, position: int) -> _Tree._ProductionTree:
+        if token in _constants:
+            return _Tree._NumericProductionTree(_constants[token])
+        if token[0].isalpha() and (len(token) == 1 or token[1:].isdigit()):
+            return _Tree._SymbolProductionTree(token)
+        raise ValueError(f'{token} at position {position} is an invalid sign')
+
+    def _function(self, name: str, position: int) -> Callable[..., NumericValue]:
+        func: Callable[..., NumericValue] | None = _functions.get(name)
+        if func is None:
+            raise ValueError(f'No such a math function named {name} at position {position}')
+        return func
@@ -2,35 +2,55 @@
 
 
 import math
+import operator
+import weakref
 from string import ascii_letters as letters, digits
-from typing import Callable, NoReturn, TypeAlias, Any
+from typing import Callable, Generator, Sequence, TypeAlias, Any
 from enum import Enum
 
+from . import config
 from .config import *
 
 
 NumericValue: TypeAlias = int | float | complex | bool
-_allows = ['get_sign', 'get_value']
-
-def _unlock(*args: '_Production | NumericValue') -> None:
-    if SAFE_MODE:
-        for item in args:
-            if isinstance(item, _Production):
-                item._locked = False
-
-def _relock(*args: '_Production | NumericValue') -> None:
-    if SAFE_MODE:
-        for item in args:
-            if isinstance(item, _Production):
-                item._locked = True
-
-def _get_production_attributes(value: '_Production') -> 'tuple[Callable[[dict], NumericValue], _Tree._ProductionTree, set[str]]':
-    _unlock(value)
-    func: Callable[[dict], NumericValue] = value._func
-    tree: _Tree._ProductionTree = value._tree
-    args: set[str] = value._args
-    _relock(value)
-    return func, tree, args
+_functions: dict[str, Callable[..., NumericValue]] = {
+    'abs': abs, 
+    'floor': math.floor, 
+    'ceil': math.ceil, 
+    'trunc': math.trunc, 
+    'round': round, 
+}
+_nondeterministic_functions: set[Callable[..., NumericValue]] = set()
+# functions that are control flow, by kind('branch', 'and' or 'or'), their arguments
+# are evaluated in order and only as far as the result needs
+_lazy_functions: dict[Callable[..., NumericValue], str] = {}
+
+def _operator_table() -> 'tuple[dict[str, Callable], dict[tuple[str, bool, bool], Callable]]':
+    # The closure factories are compiled once here, keyed by operator and by whether
+    # each operand is a production, so building a formula never calls eval.
+    operators1e: dict[str, Callable] = {}
+    operators2e: dict[tuple[str, bool, bool], Callable] = {}
+    for operator in ('+', '-', '~'):
+        operators1e[operator] = eval(f'lambda func: lambda kwargs: {operator}func(kwargs)')
+    for operator in ('+', '-', '*', '//', '/', '%', '**', '<<', '>>', '&', '^', '|', '==', '!=', '<', '>', '<=', '>='):
+        operators2e[operator, True, True] = eval(f'lambda lfunc, rfunc: lambda kwargs: lfunc(kwargs) {operator} rfunc(kwargs)')
+        operators2e[operator, False, True] = eval(f'lambda left, rfunc: lambda kwargs: left {operator} rfunc(kwargs)')
+        operators2e[operator, True, False] = eval(f'lambda lfunc, right: lambda kwargs: lfunc(kwargs) {operator} right')
+    return operators1e, operators2e
+
+_operators1e, _operators2e = _operator_table()
+
+# operators applied on values directly
+_value_operators1e: dict[str, Callable[[Any], Any]] = {
+    '+': operator.pos, '-': operator.neg, '~': operator.invert, 
+}
+_value_operators2e: dict[str, Callable[[Any, Any], Any]] = {
+    '+': operator.add, '-': operator.sub, '*': operator.mul, '//': operator.floordiv, 
+    '/': operator.truediv, '%': operator.mod, '**': operator.pow, '<<': operator.lshift, 
+    '>>': operator.rshift, '&': operator.and_, '^': operator.xor, '|': operator.or_, 
+    '==': operator.eq, '!=': operator.ne, '<': operator.lt, '>': operator.gt, 
+    '<=': operator.le, '>=': operator.ge, 
+}
 
 class _OperatorMode(Enum):
     OPERATOR1E = '1e'
@@ -39,45 +59,455 @@ class _OperatorMode(Enum):
     FUNCTION2E = 'f2e'
 
 class _Tree:
+    '''
+    Nodes of expression trees.
+
+    Nodes are immutable and hash-consed: constructing a node that is structurally
+    equal to a living one returns the living one, so identical subtrees are stored
+    once and two subtrees are equal exactly when they are the same object.
+    '''
+
+    # the types a node may evaluate to, as bits
+    _BOOL, _INT, _FLOAT, _COMPLEX = 1, 2, 4, 8
+    _ANY: int = 15
+
+    # weak references to living nodes by structural key, children are keyed by their
+    # ids so that keys hold no node alive, and the entry of a node is removed when it dies
+    # (its children outlive it, so their ids are not reused while the entry exists)
+    _nodes: dict[tuple, weakref.ref] = {}
+
+    @staticmethod
+    def _find(key: tuple) -> '_Tree._ProductionTree | None':
+        ref: weakref.ref | None = _Tree._nodes.get(key)
+        return ref() if ref is not None else None
+
+    @staticmethod
+    def _intern(key: tuple, node: '_Tree._ProductionTree') -> '_Tree._ProductionTree':
+        node._production = None
+        nodes: dict[tuple, weakref.ref] = _Tree._nodes
+        def forget(ref: weakref.ref) -> None:
+            if nodes.get(key) is ref:
+                del nodes[key]
+        nodes[key] = weakref.ref(node, forget)
+        return node
+
+    @staticmethod
+    def _children(tree: '_Tree._ProductionTree') -> 'tuple[_Tree._ProductionTree, ...]':
+        if isinstance(tree, _Tree._OperatorProductionTree2E):
+            return tree._value1, tree._value2
+        if isinstance(tree, _Tree._OperatorProductionTree1E):
+            return tree._value,
+        if isinstance(tree, _Tree._FunctionProductionTree):
+            return tree._args
+        return ()
+
+    @staticmethod
+    def _replace(tree: '_Tree._ProductionTree', children: 'list[_Tree._ProductionTree]') -> '_Tree._ProductionTree':
+        # the node with its children replaced, or the node itself if it has no children
+        if isinstance(tree, _Tree._OperatorProductionTree2E):
+            return _Tree._OperatorProductionTree2E(tree._operator, children[0], children[1], tree._level)
+        if isinstance(tree, _Tree._OperatorProductionTree1E):
+            return _Tree._OperatorProductionTree1E(tree._operator, children[0], tree._level)
+        if isinstance(tree, _Tree._FunctionProductionTree):
+            return _Tree._FunctionProductionTree(tree._operator, *children, func=tree._func)
+        return tree
+
+    @staticmethod
+    def _walk(tree: '_Tree._ProductionTree', 
+        visit: 'Callable[[_Tree._ProductionTree, list], Any]', 
+        memo: 'dict[_Tree._ProductionTree, Any] | None'=None, 
+        lookup: 'Callable[[_Tree._ProductionTree], Any] | None'=None, 
+        expand: 'Callable[[_Tree._ProductionTree], Generator[_Tree._ProductionTree, Any, Any] | None] | None'=None) -> Any:
+        '''
+        Compute visit(node, results of its children) for every node bottom-up, with
+        explicit stacks instead of recursion, so the depth of tree is only bounded by memory.
+
+        Results of deterministic nodes are stored in memo if it is given, and reused
+        for repeated subtrees. Subtrees whose result is not None by lookup are not visited.
+        A node for which expand gives a generator is computed by that instead, the generator
+        yields the subtrees it needs one at a time, is sent their results, and returns the
+        result of the node, so it decides which of its subtrees are computed and when.
+        '''
+        results: list[Any] = []
+        # a node is pushed without its children first, and with them once they are pushed, or
+        # with its generator while it waits for a subtree
+        stack: list[tuple[_Tree._ProductionTree, tuple | Generator | None]] = [(tree, None)]
+        while stack:
+            node, children = stack.pop()
+            if children is None:
+                if memo is not None and node in memo:
+                    results.append(memo[node])
+                    continue
+                if lookup is not None and (result := lookup(node)) is not None:
+                    results.append(result)
+                    continue
+                if expand is not None and (children := expand(node)) is not None:
+                    results.append(None) # a generator is started by sending None
+                else:
+                    children = _Tree._children(node)
+                    if children:
+                        stack.append((node, children))
+                        stack.extend([(child, None) for child in reversed(children)])
+                        continue
+            if type(children) is tuple:
+                count: int = len(results) - len(children)
+                result = visit(node, results[count:])
+                del results[count:]
+            else:
+                try:
+                    subtree: _Tree._ProductionTree = children.send(results.pop())
+                except StopIteration as stop:
+                    result = stop.value
+                else:
+                    stack.append((node, children))
+                    stack.append((subtree, None))
+                    continue
+            if memo is not None and node._deterministic:
+                memo[node] = result
+            results.append(result)
+        return results[0]
+
+    @staticmethod
+    def _fold(tree: '_Tree._ProductionTree') -> '_Tree._ProductionTree':
+        '''
+        Rewrite a node whose children are already folded: evaluate it if all of its
+        operands are constants, or drop an int identity operand(x*1, 1*x, x+0, 0+x, x-0, x**1)
+        if the types the other operand may have make it exact. The node itself is returned
+        if nothing can be done.
+        '''
+        if isinstance(tree, _Tree._OperatorProductionTree2E):
+            left: _Tree._ProductionTree = tree._value1
+            right: _Tree._ProductionTree = tree._value2
+            left_value: Any = left._value if isinstance(left, _Tree._NumericProductionTree) else None
+            right_value: Any = right._value if isinstance(right, _Tree._NumericProductionTree) else None
+            if left_value is not None and right_value is not None:
+                return _Tree._fold_value(_value_operators2e[tree._operator], tree, left_value, right_value)
+            # an identity is only dropped if the operand cannot be of a type it changes: bools
+            # become ints, -0.0+0 is 0.0, and complex numbers times 1 may change signed zeros and infinities
+            match tree._operator:
+                case '*' if _Tree._is_constant(right_value, 1) and not left._types & (_Tree._BOOL | _Tree._COMPLEX): return left
+                case '*' if _Tree._is_constant(left_value, 1) and not right._types & (_Tree._BOOL | _Tree._COMPLEX): return right
+                case '+' if _Tree._is_constant(right_value, 0) and left._types == _Tree._INT: return left
+                case '+' if _Tree._is_constant(left_value, 0) and right._types == _Tree._INT: return right
+                case '-' if _Tree._is_constant(right_value, 0) and not left._types & _Tree._BOOL: return left
+                case '**' if _Tree._is_constant(right_value, 1) and not left._types & (_Tree._BOOL | _Tree._COMPLEX): return left
+            return tree
+        if isinstance(tree, _Tree._OperatorProductionTree1E):
+            if isinstance(tree._value, _Tree._NumericProductionTree):
+                return _Tree._fold_value(_value_operators1e[tree._operator], tree, tree._value._value)
+            return tree
+        if isinstance(tree, _Tree._FunctionProductionTree):
+            if tree._deterministic and tree._func is not None and \
+            all(isinstance(arg, _Tree._NumericProductionTree) for arg in tree._args):
+                return _Tree._fold_value(tree._func, tree, *(arg._value for arg in tree._args))
+            if _Tree._control(tree) is not None:
+                return _Tree._fold_control(tree)
+            return tree
+        return tree
+
+    @staticmethod
+    def _fold_control(tree: '_Tree._FunctionProductionTree') -> '_Tree._ProductionTree':
+        # drop constant conditions and arguments that are never evaluated, nothing that would be evaluated is dropped
+        kind: str | None = _Tree._control(tree)
+        args: list[_Tree._ProductionTree] = []
+        if kind == 'branch':
+            default: _Tree._ProductionTree = tree._args[-1]
+            for value, condition in zip(tree._args[:-1:2], tree._args[1::2]):
+                if not isinstance(condition, _Tree._NumericProductionTree):
+                    args += [value, condition]
+                elif condition._value: # later pairs are never reached
+                    default = value
+                    break
+            if not args:
+                return default
+            args.append(default)
+        else:
+            decided: bool = kind == 'or'
+            for arg in tree._args:
+                if not isinstance(arg, _Tree._NumericProductionTree):
+                    args.append(arg)
+                elif bool(arg._value) == decided: # later arguments are never reached
+                    if not args:
+                        return _Tree._NumericProductionTree(decided)
+                    args.append(arg)
+                    break
+            if not args:
+                return _Tree._NumericProductionTree(not decided)
+        if len(args) == len(tree._args):
+            return tree
+        return _Tree._FunctionProductionTree(tree._operator, *args, func=tree._func)
+
+    @staticmethod
+    def _fold_value(func: Callable[..., Any], tree: '_Tree._ProductionTree', *values: NumericValue) -> '_Tree._ProductionTree':
+        try:
+            value: Any = func(*values)
+        except Exception: # keep the error for evaluation time
+            return tree
+        if isinstance(value, NumericValue):
+            return _Tree._NumericProductionTree(value)
+        return tree
+
+    @staticmethod
+    def _control(tree: '_Tree._ProductionTree') -> str | None:
+        '''
+        The kind of control flow of a node('branch', 'and' or 'or'), or None if all of
+        its children are evaluated before it. A branch is (value, condition) pairs
+        followed by a default, a branch with a bad count of arguments is not lazy so
+        that it raises as it does when evaluated eagerly.
+        '''
+        if not isinstance(tree, _Tree._FunctionProductionTree):
+            return None
+        kind: str | None = _lazy_functions.get(tree._func)
+        if kind == 'branch' and len(tree._args) % 2 != 1:
+            return None
+        return kind
+
+    @staticmethod
+    def _is_constant(value: Any, constant: int) -> bool:
+        # only ints, float identities change the type of int operands
+        return type(value) is int and value == constant
+
+    @staticmethod
+    def _value_types(value: Any) -> int:
+        return {bool: _Tree._BOOL, int: _Tree._INT, float: _Tree._FLOAT, complex: _Tree._COMPLEX}.get(type(value), _Tree._ANY)
+
+    @staticmethod
+    def _operator_types(operator: str, left: int, right: int | None=None) -> int:
+        # the types of the result of an operator on operands of the given types
+        if right is None:
+            if operator == '~':
+                return _Tree._INT
+            return (left & ~_Tree._BOOL) | (_Tree._INT if left & _Tree._BOOL else 0)
+        if operator in ('==', '!=', '<', '>', '<=', '>='):
+            return _Tree._BOOL
+        if operator in ('&', '|', '^'):
+            return _Tree._BOOL | _Tree._INT
+        if operator in ('<<', '>>'):
+            return _Tree._INT
+        integer, real = _Tree._BOOL | _Tree._INT, _Tree._BOOL | _Tree._INT | _Tree._FLOAT
+        types: int = _Tree._COMPLEX if (left | right) & _Tree._COMPLEX else 0
+        if operator == '**':
+            # negative exponents give floats and negative bases to fractional exponents complex numbers
+            return types | (_Tree._FLOAT | _Tree._COMPLEX if left & real and right & real else 0) | \
+                (_Tree._INT if left & integer and right & integer else 0)
+        if left & real and right & real and (left | right) & _Tree._FLOAT or operator == '/' and left & real and right & real:
+            types |= _Tree._FLOAT
+        if operator != '/' and left & integer and right & integer:
+            types |= _Tree._INT
+        return types
 
     class _ProductionTree:
 
-        def __init__(self, operator: str | None=None, level: int=0) -> None:
-            self._operator: str | None = operator
-            self._level: int = level
+        # _size: count of operator and function nodes, repeated subtrees counted repeatedly
+        # _depth: count of operator and function nodes on the longest path to a leaf
+        # _deterministic: False if a function of the subtree returns random values
+        # _types: the types the subtree may evaluate to, as bits of _Tree._BOOL, _INT, _FLOAT and _COMPLEX
+        __slots__ = ('_operator', '_level', '_size', '_depth', '_deterministic', '_types', '_production', '__weakref__')
 
     class _NumericProductionTree(_ProductionTree):
 
-        def __init__(self, value: NumericValue) -> None:
-            super().__init__()
-            self._value: NumericValue = value
+        __slots__ = ('_value',)
+
+        def __new__(cls, value: NumericValue) -> '_Tree._NumericProductionTree':
+            key: tuple = (cls, type(value), repr(value)) # repr keeps 1, 1.0, True and 0.0, -0.0 apart
+            node: _Tree._NumericProductionTree | None = _Tree._find(key)
+            if node is None:
+                node = object.__new__(cls)
+                node._operator, node._level, node._value = None, 0, value
+                node._size, node._depth, node._deterministic = 0, 0, True
+                node._types = _Tree._value_types(value)
+                _Tree._intern(key, node)
+            return node
 
     class _SymbolProductionTree(_ProductionTree):
 
-        def __init__(self, sign: str) -> None:
-            super().__init__()
-            self._sign: str = sign
+        __slots__ = ('_sign',)
+
+        def __new__(cls, sign: str) -> '_Tree._SymbolProductionTree':
+            key: tuple = (cls, sign)
+            node: _Tree._SymbolProductionTree | None = _Tree._find(key)
+            if node is None:
+                node = object.__new__(cls)
+                node._operator, node._level, node._sign = None, 0, sign
+                node._size, node._depth, node._deterministic = 0, 0, True
+                node._types = _Tree._ANY
+                _Tree._intern(key, node)
+            return node
 
     class _FunctionProductionTree(_ProductionTree):
 
-        def __init__(self, operator: str, *args: '_Tree._ProductionTree') -> None:
-            super().__init__(operator)
-            self._args: tuple[_Tree._ProductionTree] = args
+        __slots__ = ('_args', '_func')
+
+        def __new__(cls, operator: str, *args: '_Tree._ProductionTree', func: Callable[..., NumericValue] | None=None) -> '_Tree._FunctionProductionTree':
+            key: tuple = (cls, operator, func, *map(id, args))
+            node: _Tree._FunctionProductionTree | None = _Tree._find(key)
+            if node is None:
+                node = object.__new__(cls)
+                node._operator, node._level, node._args, node._func = operator, 0, args, func
+                node._size = 1 + sum(arg._size for arg in args)
+                node._depth = 1 + max((arg._depth for arg in args), default=0)
+                node._deterministic = func not in _nondeterministic_functions and all(arg._deterministic for arg in args)
+                node._types = _Tree._ANY
+                _Tree._intern(key, node)
+            return node
 
     class _OperatorProductionTree1E(_ProductionTree):
 
-        def __init__(self, operator: str, value: '_Tree._ProductionTree', level: int) -> None:
-            super().__init__(operator, level)
-            self._value: _Tree._ProductionTree = value
+        __slots__ = ('_value',)
+
+        def __new__(cls, operator: str, value: '_Tree._ProductionTree', level: int) -> '_Tree._OperatorProductionTree1E':
+            key: tuple = (cls, operator, level, id(value))
+            node: _Tree._OperatorProductionTree1E | None = _Tree._find(key)
+            if node is None:
+                node = object.__new__(cls)
+                node._operator, node._level, node._value = operator, level, value
+                node._size, node._depth, node._deterministic = 1 + value._size, 1 + value._depth, value._deterministic
+                node._types = _Tree._operator_types(operator, value._types)
+                _Tree._intern(key, node)
+            return node
 
     class _OperatorProductionTree2E(_ProductionTree):
 
-        def __init__(self, operator: str, value1: '_Tree._ProductionTree', value2: '_Tree._ProductionTree', level: int) -> None:
-            super().__init__(operator, level)
-            self._value1: _Tree._ProductionTree = value1
-            self._value2: _Tree._ProductionTree = value2
+        __slots__ = ('_value1', '_value2')
+
+        def __new__(cls, operator: str, value1: '_Tree._ProductionTree', value2: '_Tree._ProductionTree', level: int) -> '_Tree._OperatorProductionTree2E':
+            key: tuple = (cls, operator, level, id(value1), id(value2))
+            node: _Tree._OperatorProductionTree2E | None = _Tree._find(key)
+            if node is None:
+                node = object.__new__(cls)
+                node._operator, node._level, node._value1, node._value2 = operator, level, value1, value2
+                node._size = 1 + value1._size + value2._size
+                node._depth = 1 + max(value1._depth, value2._depth)
+                node._deterministic = value1._deterministic and value2._deterministic
+                node._types = _Tree._operator_types(operator, value1._types, value2._types)
+                _Tree._intern(key, node)
+            return node
 
 class _Productor:
+
+    @staticmethod
+    def _reuse(tree: _Tree._ProductionTree) -> '_Production | None':
+        # an existing production equivalent to the tree, or None if one must be built
+        if config.AUTO_SIMPLIFY:
+            folded: _Tree._ProductionTree = _Tree._fold(tree)
+            if folded is not tree:
+                return _Productor._rebuild(folded)
+        return _shared_production(tree)
+
+    @staticmethod
+    def _rebuild(tree: _Tree._ProductionTree) -> '_Production':
+        return _Tree._walk(tree, _Productor._rebuild_node, lookup=_shared_production)
+
+    @staticmethod
+    def _rebuild_node(tree: _Tree._ProductionTree, children: 'list[_Production]') -> '_Production':
+        # nodes that already have a production are skipped by the walk
+        if isinstance(tree, _Tree._NumericProductionTree):
+            return Numeric(tree._value)
+        if isinstance(tree, _Tree._SymbolProductionTree):
+            return Symbol(tree._sign)
+        if isinstance(tree, _Tree._FunctionProductionTree):
+            return _Productor._rebuild_function(tree, children)
+        if isinstance(tree, _Tree._OperatorProductionTree1E):
+            return _Productor._product1e(tree._operator, children[0], tree._level)
+        if isinstance(tree, _Tree._OperatorProductionTree2E):
+            left: _Production | NumericValue = _Productor._rebuild_operand(tree._value1, children[0])
+            right: _Production | NumericValue = _Productor._rebuild_operand(tree._value2, children[1])
+            if not isinstance(left, _Production) and not isinstance(right, _Production):
+                left = children[0]
+            is_productions: list[bool] = [isinstance(left, _Production), isinstance(right, _Production)]
+            return _Productor._product2e(tree._operator, left, right, is_productions, tree._level)
+        raise ValueError('Bad tree was given.')
+
+    @staticmethod
+    def _rebuild_operand(tree: _Tree._ProductionTree, production: '_Production') -> '_Production | NumericValue':
+        if isinstance(tree, _Tree._NumericProductionTree):
+            return tree._value
+        return production
+
+    @staticmethod
+    def _rebuild_function(tree: _Tree._FunctionProductionTree, children: 'list[_Production]') -> '_Production':
+        values: list[NumericValue | None] = []
+        funcs: list[Callable[[dict], NumericValue] | None] = []
+        args: set[str] = set()
+        for child_tree, child in zip(tree._args, children):
+            if isinstance(child_tree, _Tree._NumericProductionTree):
+                values.append(child_tree._value)
+                funcs.append(None)
+                continue
+            func, _, sub_args = _get_production_attributes(child)
+            values.append(None)
+            funcs.append(func)
+            args |= sub_args
+        return _intern_production(_Production(_Productor._function_evaluator(tree._func, values, funcs), tree, args))
+
+    @staticmethod
+    def _function_evaluator(func: Callable[..., NumericValue], 
+        values: 'Sequence[NumericValue | _Production | None]', 
+        funcs: list[Callable[[dict], NumericValue] | None]) -> Callable[[dict], NumericValue]:
+        '''
+        Closure that calls func with its arguments, funcs has the function of every argument
+        that is a production and None for constants, whose values are taken from values.
+        The layout of arguments is resolved here once, not on every evaluation.
+        '''
+        kind: str | None = _lazy_functions.get(func)
+        if kind is not None and (kind != 'branch' or len(funcs) % 2 == 1):
+            return _Productor._lazy_evaluator(kind, values, funcs)
+        match funcs:
+            case [None]:
+                value = values[0]
+                return lambda kwargs: func(value)
+            case [func1]:
+                return lambda kwargs: func(func1(kwargs))
+            case [None, None]:
+                value1, value2 = values
+                return lambda kwargs: func(value1, value2)
+            case [func1, None]:
+                value2 = values[1]
+                return lambda kwargs: func(func1(kwargs), value2)
+            case [None, func2]:
+                value1 = values[0]
+                return lambda kwargs: func(value1, func2(kwargs))
+            case [func1, func2]:
+                return lambda kwargs: func(func1(kwargs), func2(kwargs))
+        if all(arg_func is not None for arg_func in funcs):
+            return lambda kwargs: func(*[arg_func(kwargs) for arg_func in funcs])
+        template: list[NumericValue | None] = [None if arg_func is not None else value for value, arg_func in zip(values, funcs)]
+        productions: list[tuple[int, Callable[[dict], NumericValue]]] = [(index, arg_func) for index, arg_func in enumerate(funcs) if arg_func is not None]
+        def evaluator(kwargs: dict) -> NumericValue:
+            args: list[NumericValue | None] = template.copy()
+            for index, arg_func in productions:
+                args[index] = arg_func(kwargs)
+            return func(*args)
+        return evaluator
+
+    @staticmethod
+    def _lazy_evaluator(kind: str, 
+        values: 'Sequence[NumericValue | _Production | None]', 
+        funcs: list[Callable[[dict], NumericValue] | None]) -> Callable[[dict], NumericValue]:
+        # arguments are evaluated in order, and only until the result is known
+        thunks: list[Callable[[dict], NumericValue]] = [arg_func if arg_func is not None else (lambda kwargs, value=value: value)
+            for value, arg_func in zip(values, funcs)]
+        if kind == 'branch':
+            pairs: list[tuple[Callable[[dict], NumericValue], Callable[[dict], NumericValue]]] = list(zip(thunks[:-1:2], thunks[1::2]))
+            default: Callable[[dict], NumericValue] = thunks[-1]
+            def evaluator(kwargs: dict) -> NumericValue:
+                for value, condition in pairs:
+                    if condition(kwargs):
+                        return value(kwargs)
+                return default(kwargs)
+        elif kind == 'and':
+            def evaluator(kwargs: dict) -> NumericValue:
+                for thunk in thunks:
+                    if not thunk(kwargs):
+                        return False
+                return True
+        else:
+            def evaluator(kwargs: dict) -> NumericValue:
+                for thunk in thunks:
+                    if thunk(kwargs):
+                        return True
+                return False
+        return evaluator
     
     @staticmethod
     def _product(operator: str, 
@@ -109,8 +539,9 @@ class _Productor:
         else:
             short_name: str = func_name
             wrapper_func: Callable[[NumericValue], NumericValue] = __builtins__[short_name]
-        production_func: Callable[[dict], NumericValue] = lambda kwargs: wrapper_func(func(kwargs))
-        return _Production(production_func,  _Tree._FunctionProductionTree(short_name, tree), args)
+        func_tree: _Tree._FunctionProductionTree = _Tree._FunctionProductionTree(short_name, tree, func=wrapper_func)
+        return _Productor._reuse(func_tree) or _intern_production(
+            _Production(lambda kwargs: wrapper_func(func(kwargs)), func_tree, args))
 
     @staticmethod
     def _productfunc2e(func_name: str, value1: '_Production | NumericValue', value2: '_Production | NumericValue', is_productions: list[bool]) -> '_Production':
@@ -124,8 +555,9 @@ class _Productor:
             else:
                 short_name: str = func_name
                 wrapper_func: Callable[[NumericValue], NumericValue] = __builtins__[short_name]
-            production_func: Callable[[dict], NumericValue] = lambda kwargs: wrapper_func(func1(kwargs), func2(kwargs))
-            return _Production(production_func, _Tree._FunctionProductionTree(short_name, tree1, tree2), args1 | args2)
+            func_tree: _Tree._FunctionProductionTree = _Tree._FunctionProductionTree(short_name, tree1, tree2, func=wrapper_func)
+            return _Productor._reuse(func_tree) or _intern_production(
+                _Production(lambda kwargs: wrapper_func(func1(kwargs), func2(kwargs)), func_tree, args1 | args2))
         
         if (not is_productions[0]) and is_productions[1]:
             func2, tree2, args2 = _get_production_attributes(value2)
@@ -136,8 +568,9 @@ class _Productor:
             else:
                 short_name: str = func_name
                 wrapper_func: Callable[[NumericValue], NumericValue] = __builtins__[short_name]
-            production_func: Callable[[dict], NumericValue] = lambda kwargs: wrapper_func(value1, func2(kwargs))
-            return _Production(production_func, _Tree._FunctionProductionTree(short_name, tree1, tree2), args2)
+            func_tree: _Tree._FunctionProductionTree = _Tree._FunctionProductionTree(short_name, tree1, tree2, func=wrapper_func)
+            return _Productor._reuse(func_tree) or _intern_production(
+                _Production(lambda kwargs: wrapper_func(value1, func2(kwargs)), func_tree, args2))
         
         else:
             func1, tree1, args1 = _get_production_attributes(value1)
@@ -148,66 +581,47 @@ class _Productor:
             else:
                 short_name: str = func_name
                 wrapper_func: Callable[[NumericValue], NumericValue] = __builtins__[short_name]
-            production_func: Callable[[dict], NumericValue] = lambda kwargs: wrapper_func(func1(kwargs), value2)
-            return _Production(production_func, _Tree._FunctionProductionTree(short_name, tree1, tree2), args1)
+            func_tree: _Tree._FunctionProductionTree = _Tree._FunctionProductionTree(short_name, tree1, tree2, func=wrapper_func)
+            return _Productor._reuse(func_tree) or _intern_production(
+                _Production(lambda kwargs: wrapper_func(func1(kwargs), value2), func_tree, args1))
     
     @staticmethod
     def _product1e(operator: str, value: '_Production', level: int) -> '_Production':
         func, tree, args = _get_production_attributes(value)
-        return _Production(
-            eval(f'lambda kwargs: {operator}func(kwargs)', 
-                {'func': func}), 
-                _Tree._OperatorProductionTree1E(operator, tree, level), 
-                args)
+        operator_tree: _Tree._OperatorProductionTree1E = _Tree._OperatorProductionTree1E(operator, tree, level)
+        return _Productor._reuse(operator_tree) or _intern_production(
+            _Production(_operators1e[operator](func), operator_tree, args))
 
     @staticmethod
     def _product2e(operator: str, left: '_Production | NumericValue', right: '_Production | NumericValue', is_productions: list[bool], level: int) -> '_Production':
+        factory: Callable[[Any, Any], Callable[[dict], NumericValue]] = _operators2e[operator, *is_productions]
         if is_productions[0] and is_productions[1]:
             lfunc, ltree, largs = _get_production_attributes(left)
             rfunc, rtree, rargs = _get_production_attributes(right)
-            return _Production(
-                eval(f'lambda kwargs: lfunc(kwargs) {operator} rfunc(kwargs)',
-                    {'lfunc': lfunc,
-                    'rfunc': rfunc}), 
-                _Tree._OperatorProductionTree2E(operator, ltree, rtree, level), 
-                largs | rargs)
+            operator_tree: _Tree._OperatorProductionTree2E = _Tree._OperatorProductionTree2E(operator, ltree, rtree, level)
+            return _Productor._reuse(operator_tree) or _intern_production(
+                _Production(factory(lfunc, rfunc), operator_tree, largs | rargs))
         
         if (not is_productions[0]) and is_productions[1]:
             rfunc, rtree, rargs = _get_production_attributes(right)
             ltree: _Tree._NumericProductionTree = _Tree._NumericProductionTree(left)
-            return _Production(
-                eval(f'lambda kwargs: left {operator} func(kwargs)',
-                    {'left': left,
-                    'func': rfunc}),
-                _Tree._OperatorProductionTree2E(operator, ltree, rtree, level), 
-                rargs)
+            operator_tree: _Tree._OperatorProductionTree2E = _Tree._OperatorProductionTree2E(operator, ltree, rtree, level)
+            return _Productor._reuse(operator_tree) or _intern_production(
+                _Production(factory(left, rfunc), operator_tree, rargs))
 
         else:
             lfunc, ltree, largs = _get_production_attributes(left)
             rtree: _Tree._NumericProductionTree = _Tree._NumericProductionTree(right)
-            return _Production(
-                eval(f'lambda kwargs: func(kwargs) {operator} right',
-                    {'func': lfunc,
-                    'right': right}),
-                _Tree._OperatorProductionTree2E(operator, ltree, rtree, level), 
-                largs)
+            operator_tree: _Tree._OperatorProductionTree2E = _Tree._OperatorProductionTree2E(operator, ltree, rtree, level)
+            return _Productor._reuse(operator_tree) or _intern_production(
+                _Production(factory(lfunc, right), operator_tree, largs))
 
 class _Production:
+
+    __slots__ = ('_attributes', '__weakref__')
     
     def __init__(self, func: Callable[[dict], NumericValue], tree: _Tree._ProductionTree, args: set[str]) -> None:
-        self._locked: bool = False
-        self._func: Callable[[dict], NumericValue] = func
-        self._tree: _Tree._ProductionTree = tree
-        self._args: set[str] = args
-        _relock(self)
-    
-    def __getattribute__(self, __name: str) -> Any | NoReturn:
-        if (__name in _allows) or \
-        (not super().__getattribute__('_locked')) or \
-        (not SAFE_MODE):
-            return super().__getattribute__(__name)
-        raise AttributeError('cannot access a Production object')
-        
+        _set_production_attributes(self, (func, tree, args))
     
     # functions with 1 element
     def __abs__(self): return _Productor._product('abs', self, mode=_OperatorMode.FUNCTION1E)
@@ -257,6 +671,27 @@ class _Production:
     def __rxor__(self, other): return _Productor._product('^', other, self, 7, mode=_OperatorMode.OPERATOR2E)
     def __ror__(self, other): return _Productor._product('|', other, self, 7, mode=_OperatorMode.OPERATOR2E)
 
+# Internal code reads and writes the (func, tree, args) of a production through the
+# slot descriptor directly. In safe mode the descriptor is removed from the class
+# afterwards, so a production exposes no attribute to users and needs no lock.
+_production_attributes = _Production._attributes
+if SAFE_MODE:
+    del _Production._attributes
+
+_get_production_attributes: 'Callable[[_Production], tuple[Callable[[dict], NumericValue], _Tree._ProductionTree, set[str]]]' = _production_attributes.__get__
+_set_production_attributes: 'Callable[[_Production, tuple], None]' = _production_attributes.__set__
+
+# Productions are determined by their trees, so a production is shared by every
+# formula that builds the same (interned) tree instead of rebuilding its closure.
+# Each tree node keeps a weak reference to the production built on it.
+def _shared_production(tree: _Tree._ProductionTree) -> _Production | None:
+    ref: weakref.ref | None = tree._production
+    return ref() if ref is not None else None
+
+def _intern_production(production: _Production) -> _Production:
+    _get_production_attributes(production)[1]._production = weakref.ref(production)
+    return production
+
 class Symbol(_Production):
     '''
     Argument of formula.
@@ -268,9 +703,9 @@ class Symbol(_Production):
         ValueError: The symbol sign is out of A-Z and a-z, or it has been occupied.
     '''
 
+    __slots__ = ()
+
     def __init__(self, sign: str) -> None:
-        self._locked: bool = False
-        self._sign: str = sign
         if not self._check(sign):
             raise ValueError(f'{sign} is an invalid sign')
         
@@ -278,7 +713,6 @@ class Symbol(_Production):
         tree: _Tree._SymbolProductionTree = _Tree._SymbolProductionTree(sign)
         args: set[str] = {sign}
         super().__init__(func, tree, args)
-        _relock(self)
     
     def get_sign(self) -> str:
         '''
@@ -287,12 +721,11 @@ class Symbol(_Production):
         Returns:
             str: The sign of symbol.
         '''
-        _unlock(self)
-        sign: str = self._sign
-        _relock(self)
-        return sign
+        tree: _Tree._SymbolProductionTree = _get_production_attributes(self)[1]
+        return tree._sign
     
-    def _check(self, sign: str) -> bool:
+    @staticmethod
+    def _check(sign: str) -> bool:
         if len(sign) == 0: return False
         if sign[0] in letters:
             if (len(sign) > 1 and all([ch in digits for ch in sign[1:]])) or \
@@ -303,6 +736,8 @@ class Symbol(_Production):
         
 class Numeric(_Production):
 
+    __slots__ = ()
+
     def __init__(self, value: NumericValue) -> None:
         '''
         Constant value of formula.
@@ -310,15 +745,12 @@ class Numeric(_Production):
         Args:
             value (NumericValue): a constant value.
         '''
-        self._locked: bool = False
         if not self._check(value):
             raise TypeError(f'value argument must be an NumericValue, not\'{type(value)}\'')
-        self._value = value
         func: Callable[[dict], NumericValue] = lambda _: value
         tree: _Tree._NumericProductionTree = _Tree._NumericProductionTree(value)
         args: set[str] = set()
         super().__init__(func, tree, args)
-        _relock(self)
     
     def get_value(self) -> NumericValue:
         '''
@@ -327,10 +759,8 @@ class Numeric(_Production):
         Returns:
             str: The value of Numeric.
         '''
-        _unlock(self)
-        value = self._value
-        _relock(self) 
-        return value
+        tree: _Tree._NumericProductionTree = _get_production_attributes(self)[1]
+        return tree._value
 
     def _check(self, value: NumericValue) -> bool:
         if isinstance(value, NumericValue):
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+
+import time
+from typing import Any, Callable, Iterable
+
+from .production import NumericValue, _Tree, _value_operators1e, _value_operators2e
+
+
+# operands of a node: another node by its position, a symbol by its sign or a constant
+_NODE, _SYMBOL, _CONSTANT = range(3)
+# nodes deeper than this are indented as deep as this in the annotated tree
+_MAX_INDENT: int = 32
+
+
+def _step(kind: str, count: int, index: int, value: Any) -> tuple[int | None, Any]:
+    '''
+    The next argument of a lazy node to evaluate after the argument at index is
+    value(-1 at first) as (index, None), or (None, result) if the result is known.
+    '''
+    if kind == 'branch':
+        if index < 0:
+            return (1 if count > 1 else 0), None
+        if index % 2 == 0: # a value or the default
+            return None, value
+        if value:
+            return index - 1, None
+        return (index + 2 if index + 2 < count else count - 1), None
+    if index >= 0 and bool(value) == (kind == 'or'):
+        return None, kind == 'or'
+    if index + 1 < count:
+        return index + 1, None
+    return None, kind == 'and'
+
+
+class _Profiler:
+    '''
+    Evaluate an expression tree with a timer around every operator and function.
+
+    The tree is evaluated as the chain of closures does, every occurrence of a
+    repeated subtree is a node of its own, so counts and times are those of the
+    place where the subtree is used. Times are cumulative, they include the
+    children of a node and the overhead of the timer. Symbols and constants are
+    read by their parents and are not timed. A call that raises ends when it raises,
+    and so do the calls of its ancestors. Branches and logic evaluate their arguments
+    lazily, so arguments that are skipped are not counted.
+    '''
+
+    def __init__(self, tree: _Tree._ProductionTree, args: set[str]) -> None:
+        self._args: set[str] = args
+        self._labels: list[str] = []
+        self._depths: list[int] = []
+        self._children: list[list[int]] = []
+        self._funcs: list[Callable[..., NumericValue]] = []
+        self._kinds: list[str | None] = []
+        self._operands: list[list[tuple[int, Any]]] = []
+        self._root: tuple[int, Any] = self._build(tree)
+        self._calls: list[int] = [0] * len(self._labels)
+        self._times: list[float] = [0.0] * len(self._labels)
+        self._exceptions: list[int] = [0] * len(self._labels)
+        self._samples: int = 0
+        self._failed: int = 0
+
+    def _build(self, tree: _Tree._ProductionTree) -> tuple[int, Any]:
+        # positions are given in pre-order, so a node comes right before its subtree
+        stack: list[tuple[_Tree._ProductionTree, int, int | None]] = [(tree, 0, None)]
+        root: tuple[int, Any] | None = None
+        while stack:
+            node, depth, parent = stack.pop()
+            operand: tuple[int, Any] = self._operand(node, depth)
+            if parent is None:
+                root = operand
+            else:
+                self._operands[parent].append(operand)
+            if operand[0] != _NODE:
+                continue
+            if parent is not None:
+                self._children[parent].append(operand[1])
+            stack.extend([(child, depth + 1, operand[1]) for child in reversed(_Tree._children(node))])
+        return root
+
+    def _operand(self, tree: _Tree._ProductionTree, depth: int) -> tuple[int, Any]:
+        if isinstance(tree, _Tree._NumericProductionTree):
+            return _CONSTANT, tree._value
+        if isinstance(tree, _Tree._SymbolProductionTree):
+            return _SYMBOL, tree._sign
+        if isinstance(tree, _Tree._FunctionProductionTree):
+            if tree._func is None:
+                raise ValueError(f'function {tree._operator} cannot be evaluated')
+            label, func = f'{tree._operator}()', tree._func
+        elif isinstance(tree, _Tree._OperatorProductionTree1E):
+            label, func = f'unary {tree._operator}', _value_operators1e[tree._operator]
+        elif isinstance(tree, _Tree._OperatorProductionTree2E):
+            label, func = tree._operator, _value_operators2e[tree._operator]
+        else:
+            raise ValueError('Bad tree was given.')
+        self._labels.append(label)
+        self._depths.append(depth)
+        self._funcs.append(func)
+        self._kinds.append(_Tree._control(tree))
+        self._operands.append([])
+        self._children.append([])
+        return _NODE, len(self._labels) - 1
+
+    def _profile(self, samples: Iterable[dict[str, NumericValue]]) -> None:
+        timer: Callable[[], float] = time.perf_counter
+        values: list[NumericValue | None] = [None] * len(self._labels)
+        starts: list[float] = [0.0] * len(self._labels)
+        for kwargs in samples:
+            if kwargs.keys() != self._args:
+                raise ValueError(f'arguments do not match')
+            self._samples += 1
+            if self._root[0] != _NODE:
+                continue
+            # a node is pushed with None first, and with True once its children are pushed, a lazy
+            # node is pushed with the index of the argument it waits for
+            stack: list[tuple[int, bool | int | None]] = [(0, None)]
+            while stack:
+                position, state = stack.pop()
+                if state is None:
+                    starts[position] = timer()
+                    if self._kinds[position] is None:
+                        stack.append((position, True))
+                        stack.extend([(child, None) for child in reversed(self._children[position])])
+                        continue
+                    state = -1
+                if state is not True:
+                    index, value = self._resume(position, state, values, kwargs)
+                    if index is not None:
+                        stack.append((position, index))
+                        stack.append((self._operands[position][index][1], None))
+                        continue
+                    values[position] = value
+                    self._times[position] += timer() - starts[position]
+                    self._calls[position] += 1
+                    continue
+                args: list[NumericValue] = [values[operand] if kind == _NODE else kwargs[operand] if kind == _SYMBOL else operand
+                    for kind, operand in self._operands[position]]
+                try:
+                    values[position] = self._funcs[position](*args)
+                except Exception: # the exception is counted where it is raised, and the sample stops there
+                    self._exceptions[position] += 1
+                    self._failed += 1
+                    self._stop(timer(), [position, *(ancestor for ancestor, state in stack if state is not None)], starts)
+                    break
+                self._times[position] += timer() - starts[position]
+                self._calls[position] += 1
+
+    def _resume(self, position: int, index: int, values: list[NumericValue | None], kwargs: dict[str, NumericValue]) -> tuple[int | None, Any]:
+        # go on with a lazy node after its argument at index(-1 at first), up to the next argument
+        # that is a node, return its index, or None and the result
+        operands: list[tuple[int, Any]] = self._operands[position]
+        value: Any = values[operands[index][1]] if index >= 0 else None
+        while True:
+            index, result = _step(self._kinds[position], len(operands), index, value)
+            if index is None:
+                return None, result
+            kind, operand = operands[index]
+            if kind == _NODE:
+                return index, None
+            value = kwargs[operand] if kind == _SYMBOL else operand
+
+    def _stop(self, now: float, positions: list[int], starts: list[float]) -> None:
+        # the node that raised and its ancestors are counted as calls that ended by now
+        for position in positions:
+            self._times[position] += now - starts[position]
+            self._calls[position] += 1
+
+    def _self_time(self, position: int) -> float:
+        return self._times[position] - sum(self._times[child] for child in self._children[position])
+
+    def _render_tree(self) -> str:
+        total: float = self._times[0] if self._labels else 0.0
+        lines: list[str] = [
+            f'{self._samples} samples, {self._failed} failed',
+            f'{"calls":>10} {"total ms":>12} {"self ms":>12} {"total %":>8} {"exceptions":>10}  node']
+        for position, label in enumerate(self._labels):
+            depth: int = self._depths[position]
+            indent: str = '  ' * min(depth, _MAX_INDENT) + (f'[{depth}] ' if depth > _MAX_INDENT else '')
+            share: float = self._times[position] / total * 100 if total else 0.0
+            lines.append(
+                f'{self._calls[position]:>10} {self._times[position] * 1e3:>12.3f} {self._self_time(position) * 1e3:>12.3f} '
+                f'{share:>8.1f} {self._exceptions[position]:>10}  {indent}{label}')
+        return '\n'.join(lines)
+
+    def _render_collapsed(self) -> str:
+        # one line per node: the labels from the root joined by ";" and the self time in microseconds
+        lines: list[str] = []
+        stacks: list[str] = []
+        for position, label in enumerate(self._labels):
+            del stacks[self._depths[position]:]
+            stacks.append(label)
+            microseconds: int = round(self._self_time(position) * 1e6)
+            if microseconds > 0:
+                lines.append(f'{";".join(stacks)} {microseconds}')
+        return '\n'.join(lines)
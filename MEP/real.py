@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+
+import math
+from typing import Any, Callable
+
+from .production import NumericValue, _Tree, _functions
+
+
+_reals: tuple[type, ...] = (int, float)
+
+# functions of math that equal the functions of Math bound to cmath for real arguments in their domains
+_real_counterparts: dict[str, Callable[..., NumericValue]] = {
+    'sqrt': math.sqrt, 'log': math.log, 'hypot': math.hypot,
+    'sin': math.sin, 'cos': math.cos, 'tan': math.tan,
+    'asin': math.asin, 'acos': math.acos, 'atan': math.atan,
+    'sinh': math.sinh, 'cosh': math.cosh, 'tanh': math.tanh,
+    'asinh': math.asinh, 'acosh': math.acosh, 'atanh': math.atanh,
+    'real': lambda x: x.real,
+}
+# the domain of every argument out of which the result is complex, the predicates work
+# on numbers and elementwise on numpy arrays
+_domains: dict[str, Callable[[Any], Any]] = {
+    'sqrt': lambda x: x >= 0,
+    'log': lambda x: x > 0,
+    'asin': lambda x: abs(x) <= 1,
+    'acos': lambda x: abs(x) <= 1,
+    'acosh': lambda x: x >= 1,
+    'atanh': lambda x: abs(x) < 1,
+}
+_real_functions: dict[str, Callable[..., NumericValue]] = {}
+
+
+def _real_function(name: str, complex_func: Callable[..., NumericValue]) -> Callable[..., NumericValue]:
+    # the real function of math if all arguments are real and in its domain, else the complex one
+    real_func: Callable[..., NumericValue] | None = _real_functions.get(name)
+    if real_func is not None:
+        return real_func
+    counterpart: Callable[..., NumericValue] = _real_counterparts[name]
+    domain: Callable[[Any], Any] | None = _domains.get(name)
+    if name in ('log', 'hypot'):
+        def real_func(*args: NumericValue) -> NumericValue:
+            for arg in args:
+                if not isinstance(arg, _reals) or (domain is not None and not domain(arg)):
+                    return complex_func(*args)
+            return counterpart(*args)
+    elif domain is None:
+        real_func = lambda x: counterpart(x) if isinstance(x, _reals) else complex_func(x)
+    else:
+        real_func = lambda x: counterpart(x) if isinstance(x, _reals) and domain(x) else complex_func(x)
+    _real_functions[name] = real_func
+    return real_func
+
+def _real_tree(tree: _Tree._ProductionTree) -> _Tree._ProductionTree:
+    '''
+    The tree with the functions of Math that are bound to cmath replaced by functions
+    that return real numbers for real arguments, and complex numbers only out of the
+    real domain. Text and serialization still use the original tree.
+    '''
+    return _Tree._walk(tree, _real_node, {})
+
+def _fold_real(tree: _Tree._ProductionTree) -> _Tree._ProductionTree:
+    # evaluate a function of constants by its real function instead of the complex one
+    if isinstance(tree, _Tree._FunctionProductionTree) and tree._operator in _real_counterparts and \
+    _functions.get(tree._operator) is tree._func and all(isinstance(arg, _Tree._NumericProductionTree) for arg in tree._args):
+        return _Tree._fold_value(_real_function(tree._operator, tree._func), tree, *(arg._value for arg in tree._args))
+    return tree
+
+def _real_node(tree: _Tree._ProductionTree, children: list[_Tree._ProductionTree]) -> _Tree._ProductionTree:
+    if isinstance(tree, _Tree._FunctionProductionTree) and tree._operator in _real_counterparts and \
+    _functions.get(tree._operator) is tree._func:
+        return _Tree._FunctionProductionTree(tree._operator, *children, func=_real_function(tree._operator, tree._func))
+    return _Tree._replace(tree, children)
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+
+
+import struct
+from typing import Any, Callable
+
+from .production import Symbol, _Tree, _functions, _value_operators1e, _value_operators2e
+
+
+_MAGIC: bytes = b'MEPF'
+_VERSION: int = 1
+
+_INT, _FLOAT, _COMPLEX, _BOOL, _SYMBOL, _FUNCTION, _UNARY, _BINARY = range(8)
+_DOUBLE: struct.Struct = struct.Struct('<d')
+_COMPLEX_DOUBLE: struct.Struct = struct.Struct('<dd')
+
+
+class _TreeSerializer:
+    '''
+    Convert expression trees to and from plain tuples that can be pickled, or bytes.
+
+    A tree is stored as its distinct nodes in post-order, each record refers to its
+    children by their positions, so shared subtrees are stored once and the last
+    record is the root. Functions are stored by their names in Math.
+
+    In bytes, names are stored once in a string table, records refer to their
+    children by the distance back to them, and integers are varints.
+    '''
+
+    @staticmethod
+    def _encode(tree: _Tree._ProductionTree, args: set[str]) -> bytes:
+        strings: dict[str, int] = {}
+        body: bytearray = bytearray()
+        string: Callable[[str], None] = lambda text: _write_uint(body, strings.setdefault(text, len(strings)))
+
+        records: tuple[tuple, ...] = _TreeSerializer._dumps(tree)
+        _write_uint(body, len(args))
+        for arg in sorted(args):
+            string(arg)
+        _write_uint(body, len(records))
+        for position, record in enumerate(records):
+            match record:
+                case ('n', value):
+                    _TreeSerializer._encode_value(body, value)
+                case ('s', sign):
+                    body.append(_SYMBOL)
+                    string(sign)
+                case ('f', name, children):
+                    body.append(_FUNCTION)
+                    string(name)
+                    _write_uint(body, len(children))
+                    for child in children:
+                        _write_uint(body, position - child)
+                case ('u', operator, level, value):
+                    body.append(_UNARY)
+                    string(operator)
+                    _write_uint(body, level)
+                    _write_uint(body, position - value)
+                case ('b', operator, level, left, right):
+                    body.append(_BINARY)
+                    string(operator)
+                    _write_uint(body, level)
+                    _write_uint(body, position - left)
+                    _write_uint(body, position - right)
+
+        header: bytearray = bytearray(_MAGIC)
+        header.append(_VERSION)
+        _write_uint(header, len(strings))
+        for text in strings:
+            encoded: bytes = text.encode()
+            _write_uint(header, len(encoded))
+            header += encoded
+        return bytes(header + body)
+
+    @staticmethod
+    def _encode_value(body: bytearray, value: Any) -> None:
+        if isinstance(value, bool):
+            body += bytes((_BOOL, value))
+        elif isinstance(value, int):
+            body.append(_INT)
+            _write_uint(body, value * 2 if value >= 0 else -value * 2 - 1)
+        elif isinstance(value, float):
+            body.append(_FLOAT)
+            body += _DOUBLE.pack(value)
+        elif isinstance(value, complex):
+            body.append(_COMPLEX)
+            body += _COMPLEX_DOUBLE.pack(value.real, value.imag)
+        else:
+            raise ValueError(f'value {value!r} cannot be serialized')
+
+    @staticmethod
+    def _decode(data: bytes | memoryview) -> tuple[_Tree._ProductionTree, set[str]]:
+        if len(data) <= len(_MAGIC) or bytes(data[:len(_MAGIC)]) != _MAGIC:
+            raise ValueError('Bad data was given, it is not a serialized formula.')
+        if data[len(_MAGIC)] != _VERSION:
+            raise ValueError(f'Unsupported version {data[len(_MAGIC)]} of serialized formula.')
+        reader: _Reader = _Reader(data, len(_MAGIC) + 1)
+        strings: list[str] = [bytes(reader._bytes(reader._uint())).decode() for _ in range(reader._uint())]
+        args: set[str] = {reader._string(strings) for _ in range(reader._uint())}
+
+        records: list[tuple] = []
+        for position in range(reader._uint()):
+            tag: int = reader._byte()
+            if tag == _INT:
+                value: int = reader._uint()
+                records.append(('n', -(value + 1 >> 1) if value & 1 else value >> 1))
+            elif tag == _FLOAT:
+                records.append(('n', _DOUBLE.unpack(reader._bytes(_DOUBLE.size))[0]))
+            elif tag == _COMPLEX:
+                records.append(('n', complex(*_COMPLEX_DOUBLE.unpack(reader._bytes(_COMPLEX_DOUBLE.size)))))
+            elif tag == _BOOL:
+                records.append(('n', bool(reader._byte())))
+            elif tag == _SYMBOL:
+                records.append(('s', reader._string(strings)))
+            elif tag == _FUNCTION:
+                name: str = reader._string(strings)
+                records.append(('f', name, tuple(reader._child(position) for _ in range(reader._uint()))))
+            elif tag == _UNARY:
+                operator: str = reader._string(strings)
+                records.append(('u', operator, reader._uint(), reader._child(position)))
+            elif tag == _BINARY:
+                operator = reader._string(strings)
+                level: int = reader._uint()
+                left: int = reader._child(position)
+                records.append(('b', operator, level, left, reader._child(position)))
+            else:
+                raise ValueError(f'Bad record type {tag} was given.')
+        # arguments are pasted into the source of compiled functions, so they must be signs of symbols
+        symbols: set[str] = {record[1] for record in records if record[0] == 's'}
+        if not all(map(Symbol._check, args)) or not symbols <= args:
+            raise ValueError(f'Bad arguments {sorted(args)} were given.')
+        return _TreeSerializer._loads(tuple(records)), args
+
+    @staticmethod
+    def _dumps(tree: _Tree._ProductionTree) -> tuple[tuple, ...]:
+        positions: dict[_Tree._ProductionTree, int] = {}
+        records: list[tuple] = []
+        stack: list[tuple[_Tree._ProductionTree, bool]] = [(tree, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if node in positions:
+                continue
+            children: tuple[_Tree._ProductionTree, ...] = _Tree._children(node)
+            if expanded or not children:
+                positions[node] = len(records)
+                records.append(_TreeSerializer._record(node, [positions[child] for child in children]))
+            else:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(children) if child not in positions)
+        return tuple(records)
+
+    @staticmethod
+    def _record(tree: _Tree._ProductionTree, children: list[int]) -> tuple:
+        if isinstance(tree, _Tree._NumericProductionTree):
+            return ('n', tree._value)
+        if isinstance(tree, _Tree._SymbolProductionTree):
+            return ('s', tree._sign)
+        if isinstance(tree, _Tree._FunctionProductionTree):
+            if _functions.get(tree._operator) is not tree._func:
+                raise ValueError(f'function {tree._operator} cannot be serialized')
+            return ('f', tree._operator, tuple(children))
+        if isinstance(tree, _Tree._OperatorProductionTree1E):
+            return ('u', tree._operator, tree._level, children[0])
+        if isinstance(tree, _Tree._OperatorProductionTree2E):
+            return ('b', tree._operator, tree._level, children[0], children[1])
+        raise ValueError('Bad tree was given.')
+
+    @staticmethod
+    def _loads(records: tuple[tuple, ...]) -> _Tree._ProductionTree:
+        nodes: list[_Tree._ProductionTree] = []
+        for record in records:
+            nodes.append(_TreeSerializer._node(record, nodes))
+        if not nodes:
+            raise ValueError('Bad tree was given.')
+        return nodes[-1]
+
+    @staticmethod
+    def _node(record: tuple, nodes: list[_Tree._ProductionTree]) -> _Tree._ProductionTree:
+        child: Callable[[Any], _Tree._ProductionTree] = lambda index: _TreeSerializer._child(record, nodes, index)
+        match record:
+            case ('n', value):
+                return _Tree._NumericProductionTree(value)
+            case ('s', sign) if type(sign) is str and Symbol._check(sign):
+                return _Tree._SymbolProductionTree(sign)
+            case ('f', name, children):
+                func: Any = _functions.get(name)
+                if func is None:
+                    raise ValueError(f'No such a math function named {name}')
+                return _Tree._FunctionProductionTree(name, *map(child, children), func=func)
+            case ('u', operator, level, value) if operator in _value_operators1e:
+                return _Tree._OperatorProductionTree1E(operator, child(value), level)
+            case ('b', operator, level, left, right) if operator in _value_operators2e:
+                return _Tree._OperatorProductionTree2E(operator, child(left), child(right), level)
+        raise ValueError(f'Bad record {record} was given.')
+
+    @staticmethod
+    def _child(record: tuple, nodes: list[_Tree._ProductionTree], index: Any) -> _Tree._ProductionTree:
+        # children come before their parent, anything else is corrupted data
+        if type(index) is not int or not 0 <= index < len(nodes):
+            raise ValueError(f'Bad record {record} was given.')
+        return nodes[index]
+
+def _write_uint(buffer: bytearray, value: int) -> None:
+    while value > 0x7f:
+        buffer.append(value & 0x7f | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+class _Reader:
+
+    def __init__(self, data: bytes | memoryview, position: int=0) -> None:
+        self._data: bytes | memoryview = data
+        self._position: int = position
+
+    def _byte(self) -> int:
+        try:
+            byte: int = self._data[self._position]
+        except IndexError:
+            raise ValueError('Serialized formula is truncated.') from None
+        self._position += 1
+        return byte
+
+    def _uint(self) -> int:
+        value: int = 0
+        shift: int = 0
+        while True:
+            byte: int = self._byte()
+            value |= (byte & 0x7f) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
+
+    def _string(self, strings: list[str]) -> str:
+        index: int = self._uint()
+        if index >= len(strings):
+            raise ValueError(f'Bad string index {index} was given.')
+        return strings[index]
+
+    def _child(self, position: int) -> int:
+        distance: int = self._uint()
+        if not 0 < distance <= position:
+            raise ValueError(f'Bad child distance {distance} of record {position} was given.')
+        return position - distance
+
+    def _bytes(self, size: int) -> bytes | memoryview:
+        end: int = self._position + size
+        if end > len(self._data):
+            raise ValueError('Serialized formula is truncated.')
+        chunk: bytes | memoryview = self._data[self._position:end]
+        self._position = end
+        return chunk
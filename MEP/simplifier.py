@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+
+
+from .production import _Tree
+from .real import _fold_real
+
+
+class _Simplifier:
+    '''
+    Fold constant subtrees and drop identity operands of an expression tree, bottom-up.
+    In the real domain, functions of real constants are folded into real numbers.
+    '''
+
+    def __init__(self, real: bool=False) -> None:
+        self._simplified: dict[_Tree._ProductionTree, _Tree._ProductionTree] = {}
+        self._real: bool = real
+
+    def _simplify(self, tree: _Tree._ProductionTree) -> _Tree._ProductionTree:
+        return _Tree._walk(tree, self._simplify_node, self._simplified)
+
+    def _simplify_node(self, tree: _Tree._ProductionTree, children: list[_Tree._ProductionTree]) -> _Tree._ProductionTree:
+        node: _Tree._ProductionTree = _Tree._replace(tree, children)
+        return _Tree._fold(_fold_real(node) if self._real else node)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+
+from itertools import islice
+from typing import Any, Callable, Iterable, Iterator
+
+from .batch import _BatchEvaluator
+from .production import NumericValue, _Tree
+
+
+class _StreamEvaluator:
+    '''
+    Evaluate a formula over a lazily consumed stream of arguments.
+
+    Items are dicts of arguments or tuples of them in the order of sorted argument
+    names. Without a chunk size every item is passed straight to the compiled
+    function; with one, items are gathered into arrays and evaluated in batches.
+    Batches give the values of the compiled function, and a chunk that raises is
+    evaluated item by item, so the items before the one that raises are yielded.
+    '''
+
+    def __init__(self, tree: _Tree._ProductionTree, args: set[str], positional: Callable[..., NumericValue], keyword: Callable[[dict], NumericValue], chunk_size: int | None, real: bool=False) -> None:
+        if chunk_size is not None and chunk_size < 1:
+            raise ValueError(f'chunk_size must be positive, not {chunk_size}')
+        self._tree: _Tree._ProductionTree = tree
+        self._params: list[str] = sorted(args)
+        self._positional: Callable[..., NumericValue] = positional
+        self._keyword: Callable[[dict], NumericValue] = keyword
+        self._chunk_size: int | None = chunk_size
+        self._real: bool = real
+
+    def _stream(self, iterable: Iterable[dict[str, NumericValue] | tuple[NumericValue, ...]]) -> Iterator[NumericValue]:
+        if self._chunk_size is None:
+            positional: Callable[..., NumericValue] = self._positional
+            keyword: Callable[[dict], NumericValue] = self._keyword
+            for item in iterable:
+                yield keyword(item) if isinstance(item, dict) else positional(*item)
+            return
+
+        evaluator: _BatchEvaluator = _BatchEvaluator(self._tree, self._real)
+        iterator: Iterator[Any] = iter(iterable)
+        while chunk := list(islice(iterator, self._chunk_size)):
+            try:
+                values: list[NumericValue] = self._evaluate_chunk(evaluator, chunk)
+            except Exception:
+                for item in chunk:
+                    yield self._keyword(item) if isinstance(item, dict) else self._positional(*item)
+                continue
+            yield from values
+
+    def _evaluate_chunk(self, evaluator: _BatchEvaluator, chunk: list[Any]) -> list[NumericValue]:
+        columns: dict[str, list[NumericValue]] = {param: [] for param in self._params}
+        for item in chunk:
+            values: Iterable[NumericValue] = (item[param] for param in self._params) if isinstance(item, dict) else item
+            for column, value in zip(columns.values(), values, strict=True):
+                column.append(value)
+        evaluator._evaluated.clear()
+        return evaluator._evaluate(columns).tolist()
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+
+
+from array import array
+from typing import Any, Callable, Generator
+
+from .production import NumericValue, _Tree, _value_operators1e, _value_operators2e
+
+
+# opcodes, the operand of each is an index into the table named after it, or the
+# position of the code to jump to
+_CONST, _LOAD, _UNARY, _BINARY, _CALL, _STORE, _FETCH, _JUMP, _JUMP_IF_FALSE, _JUMP_IF_TRUE = range(10)
+
+
+class _VirtualMachine:
+    '''
+    Evaluate an expression tree as a postfix program on a value stack.
+
+    The program is kept in two array buffers, one of opcodes and one of operand
+    indices into small tables of constants, arguments, operators and functions, so
+    a formula costs a few bytes per node and no function objects. With common
+    subexpression elimination, a repeated deterministic subtree is computed once,
+    stored in a slot and fetched where it appears again.
+
+    Branches and logic are lowered with jumps, so only the arguments that decide
+    the result are computed, and a slot stored by code that may be jumped over is
+    only fetched by the code that follows it in the same arm.
+    '''
+
+    def __init__(self, tree: _Tree._ProductionTree, args: set[str], cse: bool=True) -> None:
+        self._symbols: list[str] = sorted(args)
+        self._constants: list[NumericValue] = []
+        self._operators: list[Callable[..., Any]] = []
+        self._calls: list[tuple[Callable[..., NumericValue], int]] = []
+        self._codes: array = array('B')
+        self._operands: array = array('I')
+        self._slot_count: int = 0
+        self._jumps: bool = False
+        self._lower(tree, cse)
+        if self._jumps:
+            self._run = self._run_jumps
+
+    def _lower(self, tree: _Tree._ProductionTree, cse: bool) -> None:
+        self._references_of: dict[_Tree._ProductionTree, int] = self._references(tree) if cse else {}
+        self._symbol_indices: dict[str, int] = {symbol: index for index, symbol in enumerate(self._symbols)}
+        self._indices: dict[Any, int] = {}
+        self._slots: dict[_Tree._ProductionTree, int] = {}
+        self._lower_tree(tree)
+        del self._references_of, self._symbol_indices, self._indices, self._slots
+
+    def _lower_tree(self, tree: _Tree._ProductionTree) -> None:
+        indices: dict[Any, int] = self._indices
+        slots: dict[_Tree._ProductionTree, int] = self._slots
+        # a node is pushed with False first, and with True once its children are pushed, a lazy
+        # node is pushed with the generator that lowers it while it waits for an argument
+        stack: list[tuple[_Tree._ProductionTree, bool | Generator[_Tree._ProductionTree, None, None]]] = [(tree, False)]
+        while stack:
+            node, state = stack.pop()
+            if state is False:
+                if node in slots:
+                    self._emit(_FETCH, slots[node])
+                    continue
+                if (kind := _Tree._control(node)) is None:
+                    stack.append((node, True))
+                    stack.extend([(child, False) for child in reversed(_Tree._children(node))])
+                    continue
+                state = self._lower_control(node, kind)
+
+            if state is not True:
+                arg: _Tree._ProductionTree | None = next(state, None)
+                if arg is not None:
+                    stack.append((node, state))
+                    stack.append((arg, False))
+                    continue
+            elif isinstance(node, _Tree._NumericProductionTree):
+                self._emit(_CONST, self._index(indices, node, self._constants, node._value))
+            elif isinstance(node, _Tree._SymbolProductionTree):
+                self._emit(_LOAD, self._symbol_indices[node._sign])
+            elif isinstance(node, _Tree._FunctionProductionTree):
+                if node._func is None:
+                    raise ValueError(f'function {node._operator} cannot be evaluated')
+                call: tuple[Callable[..., NumericValue], int] = (node._func, len(node._args))
+                self._emit(_CALL, self._index(indices, call, self._calls, call))
+            elif isinstance(node, _Tree._OperatorProductionTree1E):
+                operator: Callable[..., Any] = _value_operators1e[node._operator]
+                self._emit(_UNARY, self._index(indices, operator, self._operators, operator))
+            elif isinstance(node, _Tree._OperatorProductionTree2E):
+                operator = _value_operators2e[node._operator]
+                self._emit(_BINARY, self._index(indices, operator, self._operators, operator))
+            else:
+                raise ValueError('Bad tree was given.')
+
+            if self._references_of.get(node, 0) > 1 and node._deterministic and node._size:
+                slots[node] = self._slot_count
+                self._emit(_STORE, self._slot_count)
+                self._slot_count += 1
+
+    def _lower_control(self, tree: _Tree._FunctionProductionTree, kind: str) -> Generator[_Tree._ProductionTree, None, None]:
+        # yields the arguments to be lowered in turn, the code of every argument but the first may be jumped over
+        args: tuple[_Tree._ProductionTree, ...] = tree._args
+        ends: list[int] = []
+        if kind == 'branch':
+            # condition, jump to the next pair if it fails, value, jump to the end
+            for index in range(0, len(args) - 1, 2):
+                yield from self._lower_arm(args[index + 1], index > 0)
+                failed: int = self._emit(_JUMP_IF_FALSE, 0)
+                yield from self._lower_arm(args[index], True)
+                ends.append(self._emit(_JUMP, 0))
+                self._operands[failed] = len(self._codes)
+            yield from self._lower_arm(args[-1], len(args) > 1)
+        else:
+            # every argument jumps to the result as soon as it decides it, the last one decides it anyway
+            jump: int = _JUMP_IF_FALSE if kind == 'and' else _JUMP_IF_TRUE
+            decided: bool = kind != 'and'
+            for index, arg in enumerate(args):
+                yield from self._lower_arm(arg, index > 0)
+                ends.append(self._emit(jump, 0))
+            yield _Tree._NumericProductionTree(not decided)
+            skip: int = self._emit(_JUMP, 0)
+            for end in ends:
+                self._operands[end] = len(self._codes)
+            yield _Tree._NumericProductionTree(decided)
+            ends = [skip]
+        for end in ends:
+            self._operands[end] = len(self._codes)
+        self._jumps = True
+
+    def _lower_arm(self, tree: _Tree._ProductionTree, conditional: bool) -> Generator[_Tree._ProductionTree, None, None]:
+        count: int = len(self._slots)
+        yield tree
+        if conditional:
+            while len(self._slots) > count:
+                self._slots.popitem()
+
+    def _references(self, tree: _Tree._ProductionTree) -> dict[_Tree._ProductionTree, int]:
+        # count of parents of every distinct node
+        references: dict[_Tree._ProductionTree, int] = {tree: 1}
+        stack: list[_Tree._ProductionTree] = [tree]
+        while stack:
+            for child in _Tree._children(stack.pop()):
+                if child in references:
+                    references[child] += 1
+                else:
+                    references[child] = 1
+                    stack.append(child)
+        return references
+
+    def _index(self, indices: dict[Any, int], key: Any, table: list, item: Any) -> int:
+        index: int | None = indices.get(key)
+        if index is None:
+            index = indices[key] = len(table)
+            table.append(item)
+        return index
+
+    def _emit(self, code: int, operand: int) -> int:
+        self._codes.append(code)
+        self._operands.append(operand)
+        return len(self._codes) - 1
+
+    def _run(self, kwargs: dict[str, NumericValue]) -> NumericValue:
+        values: list[NumericValue] = [kwargs[symbol] for symbol in self._symbols]
+        constants: list[NumericValue] = self._constants
+        operators: list[Callable[..., Any]] = self._operators
+        calls: list[tuple[Callable[..., NumericValue], int]] = self._calls
+        slots: list[NumericValue | None] = [None] * self._slot_count
+        stack: list[NumericValue] = []
+        push: Callable[[NumericValue], None] = stack.append
+        pop: Callable[[], NumericValue] = stack.pop
+        for code, operand in zip(self._codes, self._operands):
+            if code == _BINARY:
+                right: NumericValue = pop()
+                stack[-1] = operators[operand](stack[-1], right)
+            elif code == _LOAD:
+                push(values[operand])
+            elif code == _CONST:
+                push(constants[operand])
+            elif code == _CALL:
+                func, count = calls[operand]
+                args: list[NumericValue] = stack[len(stack) - count:]
+                del stack[len(stack) - count:]
+                push(func(*args))
+            elif code == _UNARY:
+                stack[-1] = operators[operand](stack[-1])
+            elif code == _STORE:
+                slots[operand] = stack[-1]
+            else:
+                push(slots[operand])
+        return stack[-1]
+
+    def _run_jumps(self, kwargs: dict[str, NumericValue]) -> NumericValue:
+        # the same as "_run" with a program counter, for programs with branches or logic
+        values: list[NumericValue] = [kwargs[symbol] for symbol in self._symbols]
+        constants: list[NumericValue] = self._constants
+        operators: list[Callable[..., Any]] = self._operators
+        calls: list[tuple[Callable[..., NumericValue], int]] = self._calls
+        codes: array = self._codes
+        operands: array = self._operands
+        slots: list[NumericValue | None] = [None] * self._slot_count
+        stack: list[NumericValue] = []
+        push: Callable[[NumericValue], None] = stack.append
+        pop: Callable[[], NumericValue] = stack.pop
+        counter: int = 0
+        end: int = len(codes)
+        while counter < end:
+            code: int = codes[counter]
+            operand: int = operands[counter]
+            counter += 1
+            if code == _BINARY:
+                right: NumericValue = pop()
+                stack[-1] = operators[operand](stack[-1], right)
+            elif code == _LOAD:
+                push(values[operand])
+            elif code == _CONST:
+                push(constants[operand])
+            elif code == _CALL:
+                func, count = calls[operand]
+                args: list[NumericValue] = stack[len(stack) - count:]
+                del stack[len(stack) - count:]
+                push(func(*args))
+            elif code == _JUMP_IF_FALSE:
+                if not pop():
+                    counter = operand
+            elif code == _JUMP_IF_TRUE:
+                if pop():
+                    counter = operand
+            elif code == _JUMP:
+                counter = operand
+            elif code == _UNARY:
+                stack[-1] = operators[operand](stack[-1])
+            elif code == _STORE:
+                slots[operand] = stack[-1]
+            else:
+                push(slots[operand])
+        return stack[-1]
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+
+'''
+Benchmark of evaluation backends.
+
+Builds formulas of growing size and, for every backend("closure", "compiled"
+and "vm"), reports the seconds taken to prepare it and how many substitutions
+are evaluated per second.
+
+Usage:
+    python benchmarks/bench_backends.py [terms...]
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MEP import X, Y, Formula, Math
+
+
+BACKENDS: list[str] = ['closure', 'compiled', 'vm']
+
+
+def build(terms: int) -> Formula:
+    # terms are summed pairwise, so the depth stays logarithmic and closures can be used
+    productions: list = [X * i + Math.sin(Y) / (i + 1) for i in range(terms)]
+    while len(productions) > 1:
+        productions = [sum(productions[i:i + 2][1:], productions[i]) for i in range(0, len(productions), 2)]
+    return Formula(productions[0])
+
+def measure(formula: Formula, backend: str, repeat: int=3) -> tuple[float, float]:
+    start: float = time.perf_counter()
+    formula.set_backend(backend)
+    setup: float = time.perf_counter() - start
+    count: int = max(10, 20000 // formula._formula._tree._size)
+    best: float = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(count):
+            formula.subs(x=i, y=0.5).value()
+        best = min(best, time.perf_counter() - start)
+    return setup, count / best
+
+def main(terms: list[int]) -> None:
+    print(f'{"terms":>8} {"backend":>10} {"setup(s)":>10} {"evals/s":>12}')
+    for term in terms:
+        formula: Formula = build(term)
+        for backend in BACKENDS:
+            setup, rate = measure(formula, backend)
+            print(f'{term:>8} {backend:>10} {setup:>10.4f} {rate:>12,.0f}')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1, 10, 100, 1000])
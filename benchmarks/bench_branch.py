@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+
+'''
+Benchmark of piecewise formulas.
+
+Reports microseconds per evaluation of a piecewise formula with 20 branches, by
+every backend and by batches of numpy arrays, with "Math.branch", which evaluates
+only the selected branch, and with an eager copy of it defined by "Math.define",
+which evaluates every branch.
+
+Usage:
+    python benchmarks/bench_branch.py [branches] [number]
+'''
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MEP import X, Y, Formula, Math
+
+
+def eager_branch(*args):
+    for index in range(1, len(args) - 1, 2):
+        if args[index]:
+            return args[index - 1]
+    return args[-1]
+
+def tariff(branch, branches: int) -> Formula:
+    # a rate and a fee for every band of usage x, y is a discount
+    args: list = []
+    for i in range(branches):
+        args += [X * (0.1 + i / 100) * (1 - Y) + Math.sqrt(X) * i + Math.log(X + 1, 2), X < (i + 1) * 10]
+    return Formula(branch(*args, X * 0.5))
+
+def measure(statement: str, number: int, namespace: dict) -> float:
+    return min(timeit.repeat(statement, globals=namespace, number=number, repeat=5)) / number * 1e6
+
+def main(branches: int, number: int) -> None:
+    Math.define(eager_branch, 'eagerbranch')
+    lazy: Formula = tariff(Math.branch, branches)
+    eager: Formula = tariff(Math.eagerbranch, branches)
+    points: list[float] = [random.uniform(0, branches * 10) for _ in range(1000)]
+    print(f'{"backend":<10} {"lazy us":>10} {"eager us":>10} {"speedup":>8}')
+    for backend in ('closure', 'compiled', 'vm'):
+        times: list[float] = []
+        for formula in (lazy, eager):
+            formula.set_backend(backend)
+            namespace: dict = {'formula': formula, 'points': points}
+            times.append(measure('for x in points: formula.subs(x=x, y=0.1).value()', number, namespace) / len(points))
+        print(f'{backend:<10} {times[0]:>10.2f} {times[1]:>10.2f} {times[1] / times[0]:>7.1f}x')
+
+    try:
+        import numpy
+    except ImportError:
+        return
+    arrays: dict = {'x': numpy.array(points), 'y': 0.1}
+    times = [measure('formula.evaluate_batch(**arrays)', number, {'formula': formula, 'arrays': arrays}) / len(points) for formula in (lazy, eager)]
+    print(f'{"batch":<10} {times[0]:>10.2f} {times[1]:>10.2f} {times[1] / times[0]:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20, int(sys.argv[2]) if len(sys.argv) > 2 else 10)
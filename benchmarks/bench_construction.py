@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+
+'''
+Benchmark of formula construction.
+
+Builds formulas of growing size through operator overloading and reports
+how many tree nodes are produced per second.
+
+Usage:
+    python benchmarks/bench_construction.py [sizes...]
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MEP import X, Y, Math
+
+
+def build(size: int) -> None:
+    production = X
+    for i in range(size // 4):
+        production = production * Y + i - Math.sin(X)
+
+def measure(size: int, repeat: int=3) -> float:
+    best: float = float('inf')
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        build(size)
+        best = min(best, time.perf_counter() - start)
+    return size / best
+
+def main(sizes: list[int]) -> None:
+    print(f'{"nodes":>10} {"nodes/s":>14}')
+    for size in sizes:
+        print(f'{size:>10} {measure(size):>14,.0f}')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000, 100000])
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+
+
+'''
+Benchmark of very deep formulas.
+
+Builds chains of growing depth(a polynomial in Horner form) and reports the
+seconds taken to build, compile on the first evaluation, evaluate, render and
+curry them. No step may hit the recursion limit.
+
+Usage:
+    python benchmarks/bench_deep.py [depths...]
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MEP import X, Y, Formula
+
+
+def build(depth: int) -> Formula:
+    production = X
+    for i in range(depth):
+        production = production * Y + i
+    return Formula(production)
+
+def timed(func) -> tuple[float, object]:
+    start: float = time.perf_counter()
+    result: object = func()
+    return time.perf_counter() - start, result
+
+def main(depths: list[int]) -> None:
+    print(f'{"depth":>10} {"build":>9} {"compile":>9} {"value":>9} {"text":>9} {"curry":>9}')
+    for depth in depths:
+        build_time, formula = timed(lambda: build(depth))
+        compile_time, _ = timed(lambda: formula.subs(x=1, y=0.5).value())
+        value_time, _ = timed(lambda: formula.subs(x=2, y=0.5).value())
+        text_time, _ = timed(formula.text)
+        curry_time, _ = timed(lambda: formula.curry(y=0.5))
+        print(f'{depth:>10} {build_time:>9.3f} {compile_time:>9.3f} {value_time:>9.3f} {text_time:>9.3f} {curry_time:>9.3f}')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000])
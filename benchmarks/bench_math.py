@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+
+'''
+Benchmark of the overhead of Math functions.
+
+Reports nanoseconds per call of Math functions with 1, 2 and 3 arguments called
+with numbers, next to the functions they wrap, and called with symbols(building
+a formula), and nanoseconds per function node when a formula of Math functions
+is evaluated by closures.
+
+Usage:
+    python benchmarks/bench_math.py [number]
+'''
+
+import cmath
+import math
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MEP import X, Y, Formula, Math
+
+
+def measure(statement: str, number: int, namespace: dict) -> float:
+    return min(timeit.repeat(statement, globals=namespace, number=number, repeat=5)) / number * 1e9
+
+def main(number: int) -> None:
+    namespace: dict = {'cmath': cmath, 'math': math, 'Math': Math, 'X': X, 'Y': Y}
+    cases: list[tuple[str, str, str]] = [
+        ('sin(x)', 'Math.sin(0.5)', 'cmath.sin(0.5)'),
+        ('log(x, base)', 'Math.log(8, 2)', 'cmath.log(8, 2)'),
+        ('gcd(x, y, z)', 'Math.gcd(12, 18, 8)', 'math.gcd(12, 18, 8)'),
+    ]
+    print(f'{"function":<14} {"numeric ns":>11} {"wrapped ns":>11} {"overhead":>9} {"symbolic ns":>12}')
+    symbolic: dict[str, str] = {'sin(x)': 'Math.sin(X)', 'log(x, base)': 'Math.log(X, 2)', 'gcd(x, y, z)': 'Math.gcd(X, Y, 8)'}
+    for name, statement, wrapped in cases:
+        numeric_time: float = measure(statement, number, namespace)
+        wrapped_time: float = measure(wrapped, number, namespace)
+        symbolic_time: float = measure(symbolic[name], number // 10, namespace)
+        print(f'{name:<14} {numeric_time:>11.0f} {wrapped_time:>11.0f} {numeric_time / wrapped_time:>8.1f}x {symbolic_time:>12.0f}')
+
+    # a chain of function nodes, each with 1, 2 or 3 arguments
+    production = X
+    for i in range(30):
+        production = Math.gcd(Math.toint(Math.modulus(Math.log(Math.hypot(production, Y) + 1, 2))), i, 6)
+    formula: Formula = Formula(production)
+    nodes: int = formula._formula._tree._size
+    namespace['formula'] = formula
+    evaluation: float = measure('formula.subs(x=3, y=4).value()', number // 100, namespace)
+    print(f'\nclosure evaluation: {evaluation / nodes:.0f} ns per node({nodes} nodes)')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+
+
+'''
+Benchmark of formula parsing.
+
+Parses formulas of growing length from text and reports how many formulas
+are parsed per second.
+
+Usage:
+    python benchmarks/bench_parse.py [terms...]
+'''
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from MEP import Formula
+
+
+def text(terms: int) -> str:
+    return ' + '.join(f'{i}*x**2 - sin(y/{i + 1})' for i in range(terms))
+
+def measure(terms: int, repeat: int=3) -> float:
+    source: str = text(terms)
+    count: int = max(1, 2000 // terms)
+    best: float = float('inf')
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        for _ in range(count):
+            Formula.parse(source)
+        best = min(best, time.perf_counter() - start)
+    return count / best
+
+def main(terms: list[int]) -> None:
+    print(f'{"terms":>10} {"formulas/s":>14}')
+    for term in terms:
+        print(f'{term:>10} {measure(term):>14,.0f}')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [1, 10, 100])
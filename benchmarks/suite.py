@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+
+'''
+Benchmark suite of MEP.
+
+Measures building formulas of 10 to 100k nodes, "subs().value()" throughput,
+the cost of "Formula.text" and "Expression.text", "Formula.curry", the overhead
+of "Math" functions over the functions they wrap and peak memory per formula.
+Results are written as JSON, and two result files can be compared to flag
+benchmarks that got slower(or bigger) than a threshold.
+
+Every timing is the best of several rounds with garbage collection disabled,
+as timeit does, so runs on the same machine are comparable.
+
+Usage:
+    python benchmarks/suite.py run [-o results.json] [--quick]
+    python benchmarks/suite.py compare base.json head.json [--threshold 0.25]
+'''
+
+import argparse
+import cmath
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import MEP
+from MEP import X, Y, Z, Formula, Math
+
+
+SIZES: list[int] = [10, 100, 1000, 10000, 100000]
+QUICK_SIZES: list[int] = [10, 100, 1000]
+
+
+def build(size: int) -> Any:
+    # about "size" operator and function nodes, every operator of _Productor is used
+    production = X
+    for i in range(size // 5):
+        production = (production * Y + i - Math.sin(Z)) / (i + 1)
+    return production
+
+def timed(func: Callable[[], Any], rounds: int=7, min_time: float=0.1) -> float:
+    '''Best seconds per call of func, calls are looped until a round takes min_time.'''
+    loops: int = 1
+    while True:
+        elapsed: float = _round(func, loops)
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed * 10 < min_time else 1 + int(min_time / max(elapsed, 1e-9))
+    best: float = elapsed / loops
+    for _ in range(rounds - 1):
+        best = min(best, _round(func, loops) / loops)
+    return best
+
+def _round(func: Callable[[], Any], loops: int) -> float:
+    gc.collect()
+    enabled: bool = gc.isenabled()
+    gc.disable()
+    try:
+        start: float = time.perf_counter()
+        for _ in range(loops):
+            func()
+        return time.perf_counter() - start
+    finally:
+        if enabled:
+            gc.enable()
+
+def peak_memory(func: Callable[[], Any]) -> int:
+    '''Peak bytes allocated while func runs and its result is alive.'''
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result: Any = func()
+        peak: int = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+def run(quick: bool) -> dict[str, dict[str, Any]]:
+    results: dict[str, dict[str, Any]] = {}
+    def record(name: str, value: float, unit: str) -> None:
+        results[name] = {'value': value, 'unit': unit}
+        print(f'{name:<32} {value:>14.6g} {unit}', flush=True)
+
+    sizes: list[int] = QUICK_SIZES if quick else SIZES
+    for size in sizes:
+        record(f'construction[{size}]', timed(lambda: build(size), rounds=5 if size < 10000 else 3), 's')
+
+    for size in sizes:
+        record(f'memory[{size}]', peak_memory(lambda: Formula(build(size))) / size, 'bytes/node')
+
+    formula: Formula = Formula(build(100))
+    record('subs_value[100]', timed(lambda: formula.subs(x=1.5, y=0.5, z=2).value()), 's')
+    record('subs[100]', timed(lambda: formula.subs(x=1.5, y=0.5, z=2)), 's')
+
+    for size in sizes[:4]:
+        production: Any = build(size)
+        record(f'formula_text[{size}]', timed(lambda: Formula(production).text(), rounds=5), 's')
+        formula = Formula(production)
+        formula.text()
+        record(f'expression_text[{size}]', timed(lambda: formula.subs(x=1.5, y=-0.5, z=2).text(), rounds=5), 's')
+        record(f'curry[{size}]', timed(lambda: formula.curry(y=0.5), rounds=5), 's')
+
+    # overhead of Math functions called with numbers, relative to the functions they wrap
+    math_sin: float = timed(lambda: Math.sin(0.5))
+    record('math_call[sin]', math_sin, 's')
+    record('math_overhead[sin]', math_sin / timed(lambda: cmath.sin(0.5)), 'x')
+    math_hypot: float = timed(lambda: Math.hypot(3, 4, 5))
+    record('math_call[hypot]', math_hypot, 's')
+    record('math_overhead[hypot]', math_hypot / timed(lambda: cmath.sqrt(3 ** 2 + 4 ** 2 + 5 ** 2)), 'x')
+    record('math_build[sin]', timed(lambda: Math.sin(X)), 's')
+    record('math_build[hypot]', timed(lambda: Math.hypot(X, Y, 5)), 's')
+    return results
+
+def compare(base: dict[str, Any], head: dict[str, Any], threshold: float) -> int:
+    '''Print the change of every benchmark in both runs, return the count of regressions.'''
+    regressions: int = 0
+    print(f'{"benchmark":<32} {"base":>12} {"head":>12} {"change":>9}')
+    for name, result in head['results'].items():
+        before: dict[str, Any] | None = base['results'].get(name)
+        if before is None or before['value'] <= 0:
+            continue
+        change: float = result['value'] / before['value'] - 1
+        flag: str = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions += 1
+        elif change < -threshold:
+            flag = '  improved'
+        print(f'{name:<32} {before["value"]:>12.4g} {result["value"]:>12.4g} {change:>+9.1%}{flag}')
+    return regressions
+
+def main(argv: list[str]) -> int:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Benchmark suite of MEP.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser: argparse.ArgumentParser = commands.add_parser('run', help='run the benchmarks')
+    run_parser.add_argument('-o', '--output', help='write the results to a JSON file')
+    run_parser.add_argument('--quick', action='store_true', help='only run the small sizes')
+    compare_parser: argparse.ArgumentParser = commands.add_parser('compare', help='compare two result files')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('head')
+    compare_parser.add_argument('--threshold', type=float, default=0.25, help='relative change flagged as a regression(default 0.25)')
+    args: argparse.Namespace = parser.parse_args(argv)
+
+    if args.command == 'compare':
+        with open(args.base, encoding='utf-8') as file:
+            base: dict[str, Any] = json.load(file)
+        with open(args.head, encoding='utf-8') as file:
+            head: dict[str, Any] = json.load(file)
+        regressions: int = compare(base, head, args.threshold)
+        print(f'{regressions} regression(s) over {args.threshold:.0%}')
+        return 1 if regressions else 0
+
+    output: dict[str, Any] = {
+        'meta': {
+            'mep': MEP.__version__,
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'quick': args.quick,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': run(args.quick),
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(output, file, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
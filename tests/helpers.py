@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+
+import cmath
+import random
+
+from MEP import X, Y, Formula, Math, Numeric
+
+
+CONSTANTS: list = [2, -2, 3, -1, 0.5, -2.5, 1j, 2 + 1j, -1j, True]
+POINTS: list[dict] = [{'x': 2, 'y': 3}, {'x': -1.5, 'y': 0.5}, {'x': 0, 'y': -2}]
+ERRORS: tuple = (ArithmeticError, TypeError, ValueError)
+
+
+def evaluate(formula: Formula, point: dict):
+    # the value of formula at point, or the type of the error it raises
+    try:
+        return formula.subs(**point).value()
+    except ERRORS as error:
+        return type(error)
+
+def same(a, b, rel_tol: float=1e-12, abs_tol: float=0.0) -> bool:
+    if isinstance(a, type) or isinstance(b, type):
+        return a is b
+    if cmath.isnan(a) or cmath.isnan(b):
+        return cmath.isnan(a) and cmath.isnan(b)
+    return a == b or cmath.isclose(a, b, rel_tol=rel_tol, abs_tol=abs_tol)
+
+def identical(a, b) -> bool:
+    # same value of the same type, or the same error
+    return same(a, b, 0.0) and type(a) is type(b)
+
+def random_production(rng: random.Random, depth: int):
+    if depth == 0 or rng.random() < 0.2:
+        return rng.choice([X, Y, Numeric(rng.choice(CONSTANTS))])
+    left, right = random_production(rng, depth - 1), random_production(rng, depth - 1)
+    match rng.randrange(7):
+        case 0: return left + right
+        case 1: return left - right
+        case 2: return left * right
+        case 3: return left / right
+        case 4: return left ** right
+        case 5: return -left
+        case _: return Math.sin(left) + Math.hypot(left, right)
+
+def random_formula(rng: random.Random, depth: int, constants: list=CONSTANTS):
+    # operators, functions, branches and logic over x, y and constants, with both arguments in it
+    return Formula(random_node(rng, depth, constants) + X * Y)
+
+def random_node(rng: random.Random, depth: int, constants: list):
+    if depth == 0 or rng.random() < 0.2:
+        return rng.choice([X, Y, Numeric(rng.choice(constants))])
+    left, right = random_node(rng, depth - 1, constants), random_node(rng, depth - 1, constants)
+    match rng.randrange(16):
+        case 0: return left + right
+        case 1: return left - right
+        case 2: return left * right
+        case 3: return left / right
+        case 4: return left ** right
+        case 5: return left // right
+        case 6: return left % right
+        case 7: return -left
+        case 8: return left < right
+        case 9: return left == right
+        case 10: return Math.sin(left) * Math.sqrt(right)
+        case 11: return Math.hypot(left, right)
+        case 12: return Math.branch(left, X < right, right, Y > 0, left - 1)
+        case 13: return Math.logicand(left, right > 0)
+        case 14: return Math.logicor(left > 1, right)
+        case _: return Math.tofloat(left) + Math.floor(right)
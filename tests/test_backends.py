@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+
+import random
+
+import pytest
+
+from MEP import X, Y, Formula, Math, Numeric
+from helpers import ERRORS, POINTS, evaluate, identical, random_formula, same
+
+
+FORMULAS: list[Formula] = [random_formula(random.Random(seed), 4) for seed in range(200)]
+# an array has one type, so each set mixes no ints with floats, or reals with complex numbers
+POINT_SETS: dict[str, list[dict]] = {
+    'int': [{'x': 2, 'y': 3}, {'x': -1, 'y': 5}, {'x': 0, 'y': -2}, {'x': 7, 'y': 1}],
+    'float': [{'x': 2.0, 'y': 3.0}, {'x': -1.5, 'y': 0.5}, {'x': 0.0, 'y': -2.0}, {'x': 1e300, 'y': 7.25}],
+    'complex': [{'x': 2j, 'y': 3 + 0j}, {'x': -1.5 + 1j, 'y': 0.5 + 0j}],
+}
+
+
+def values(formula: Formula, points: list[dict]) -> list:
+    return [evaluate(formula, point) for point in points]
+
+def stream(formula: Formula, chunk_size: int | None) -> list:
+    # the values up to the first error, and the type of that error
+    results: list = []
+    try:
+        for value in formula.stream(POINTS, chunk_size):
+            results.append(value)
+    except ERRORS as error:
+        results.append(type(error))
+    return results
+
+def same_in_array(expected, value) -> bool:
+    # a real number among complex ones is complex with a signed zero imaginary part,
+    # which may take it to the other side of a branch cut
+    return same(expected, value, 1e-9, 1e-12) or \
+        (isinstance(expected, complex) and same(expected, value.conjugate(), 1e-9, 1e-12))
+
+@pytest.mark.parametrize('backend', ['compiled', 'vm'])
+@pytest.mark.parametrize('cse', [True, False])
+def test_backend(backend: str, cse: bool):
+    for formula in FORMULAS:
+        expected: list = values(formula, POINTS)
+        other: Formula = Formula.parse(formula.text())
+        other.set_backend(backend, cse)
+        assert all(map(identical, expected, values(other, POINTS))), formula.text()
+
+def test_compile():
+    for formula in FORMULAS:
+        other: Formula = Formula.parse(formula.text())
+        for cse in (True, False):
+            compiled = other.compile(cse)
+            for point, expected in zip(POINTS, values(formula, POINTS)):
+                try:
+                    value = compiled(point['x'], point['y'])
+                except ERRORS as error:
+                    value = type(error)
+                assert identical(expected, value), formula.text()
+
+@pytest.mark.parametrize('chunk_size', [None, 2])
+def test_stream(chunk_size: int | None):
+    for formula in FORMULAS:
+        expected: list = values(formula, POINTS)
+        results: list = stream(formula, chunk_size)
+        # the stream ends at the first error
+        if isinstance(results[-1], type):
+            expected = expected[:len(results)]
+        if chunk_size is None:
+            assert all(map(identical, expected, results)), formula.text()
+        else:
+            assert len(results) == len(expected) and all(map(same_in_array, expected, results)), formula.text()
+
+@pytest.mark.parametrize('domain', ['complex', 'real'])
+@pytest.mark.parametrize('kind', list(POINT_SETS))
+def test_batch(domain: str, kind: str):
+    numpy = pytest.importorskip('numpy')
+    points: list[dict] = POINT_SETS[kind]
+    arrays: dict = {name: numpy.array([point[name] for point in points]) for name in ('x', 'y')}
+    for formula in FORMULAS:
+        other: Formula = Formula.parse(formula.text())
+        other.set_domain(domain)
+        expected: list = values(other, points)
+        if domain == 'real' and any(isinstance(value, complex) for value in expected):
+            # points with complex values make every value complex
+            continue
+        with numpy.errstate(all='ignore'):
+            try:
+                results = other.evaluate_batch(**arrays).tolist()
+            except ERRORS as error:
+                results = type(error)
+        if any(isinstance(value, type) for value in expected):
+            assert isinstance(results, type), formula.text()
+        else:
+            assert not isinstance(results, type) and all(map(same_in_array, expected, results)), formula.text()
+
+def test_map():
+    formulas: list[Formula] = [formula for formula in FORMULAS[:20]
+        if not any(isinstance(value, type) for value in values(formula, POINTS))]
+    for formula in formulas[:3]:
+        results: list = list(formula.map(POINTS * 3, workers=2, chunk_size=2))
+        assert all(map(identical, values(formula, POINTS) * 3, results)), formula.text()
+
+@pytest.mark.parametrize('domain', ['complex', 'real'])
+def test_batch_bools(domain: str):
+    # bools are ints as in scalar evaluation, of every operator and function
+    numpy = pytest.importorskip('numpy')
+    points: list[dict] = POINT_SETS['int']
+    arrays: dict = {name: numpy.array([point[name] for point in points]) for name in ('x', 'y')}
+    productions: list = [round(X < 1), round(X < 1, 0), abs(X < 1), -(X < Y), ~(X < Y), 
+        round(X < 1) ^ Y, abs(X > Y) ** 2, (X < 1) + (Y > 1), Math.floor(X < 1), Math.sqrt(X > Y)]
+    for production in productions:
+        formula: Formula = Formula(production + X * Y)
+        formula.set_domain(domain)
+        results: list = formula.evaluate_batch(**arrays).tolist()
+        assert all(map(identical, values(formula, points), results)), formula.text()
+
+@pytest.mark.parametrize('backend', ['compiled', 'vm'])
+def test_signed_zeros(backend: str):
+    # complex constants keep the signs of their zero parts, as they do in closures
+    for value in (-1j, complex(-0.0, -1.0), complex(-2.0, 0.0), complex(0.0, -0.0), 2 - 1j, -2.5, -0.0):
+        formula: Formula = Formula(X + Numeric(value))
+        other: Formula = Formula(X + Numeric(value))
+        other.set_backend(backend)
+        for x in (0.0, -0.0, 0j):
+            expected, result = formula.subs(x=x).value(), other.subs(x=x).value()
+            assert repr(complex(expected)) == repr(complex(result)), (value, x)
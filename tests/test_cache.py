@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+
+from MEP import X, Y, Formula, Math, config
+
+
+calls: list = []
+Math.define(lambda x: calls.append(x) or x * 2, '_test_cache_double')
+Math.define(lambda x: calls.append(x) or x * 2, '_test_cache_random', False)
+
+
+def test_hits():
+    formula: Formula = Formula(Math._test_cache_double(X) + Y)
+    formula.cache()
+    calls.clear()
+    assert formula.subs(x=1, y=2).value() == 4
+    assert formula.subs(x=1, y=2).value() == 4
+    assert calls == [1]
+    assert formula.cache_info() == {'hits': 1, 'misses': 1, 'size': 1, 'maxsize': config.EXPRESSION_MAX_CACH}
+    # equal values of other types give other results
+    assert type(formula.subs(x=1.0, y=2).value()) is float
+    assert type(formula.subs(x=True, y=2).value()) is int
+    assert formula.cache_info()['misses'] == 3
+
+def test_eviction(monkeypatch):
+    monkeypatch.setattr(config, 'EXPRESSION_MAX_CACH', 2)
+    formula: Formula = Formula(Math._test_cache_double(X) + Y)
+    formula.cache()
+    calls.clear()
+    for x in (1, 2, 1, 3):
+        formula.subs(x=x, y=0).value()
+    # 1 was used after 2, so 2 is the least recently used and is evicted by 3
+    assert calls == [1, 2, 3]
+    assert formula.cache_info() == {'hits': 1, 'misses': 3, 'size': 2, 'maxsize': 2}
+    for x in (1, 3, 2):
+        formula.subs(x=x, y=0).value()
+    assert calls == [1, 2, 3, 2]
+
+def test_nondeterministic():
+    calls.clear()
+    for production in (Math._test_cache_random(X) + Y, Math.rand(X, 6) + Y):
+        formula: Formula = Formula(production)
+        formula.cache()
+        formula.subs(x=1, y=2).value()
+        formula.subs(x=1, y=2).value()
+        assert formula.cache_info() == {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 0}
+    # random functions are called on every evaluation
+    assert calls == [1, 1]
+
+def test_disable():
+    formula: Formula = Formula(Math._test_cache_double(X) + Y)
+    formula.cache()
+    formula.subs(x=1, y=2).value()
+    formula.cache(False)
+    assert formula.cache_info()['size'] == 0
+    calls.clear()
+    formula.subs(x=1, y=2).value()
+    assert calls == [1]
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+
+import random
+
+import pytest
+
+from MEP import X, Y, Formula, Math, Numeric
+from helpers import ERRORS, evaluate, same
+
+
+POINTS: list[dict] = [{'x': 0.7, 'y': 1.3}, {'x': 2.1, 'y': 0.4}, {'x': -0.6, 'y': 1.9}]
+STEP: float = 1e-6
+
+
+def smooth_production(rng: random.Random, depth: int):
+    # differentiable operators and functions
+    if depth == 0 or rng.random() < 0.2:
+        return rng.choice([X, Y, Numeric(rng.choice([2, -1, 0.5, 3, 1.5]))])
+    left, right = smooth_production(rng, depth - 1), smooth_production(rng, depth - 1)
+    match rng.randrange(8):
+        case 0: return left + right
+        case 1: return left - right
+        case 2: return left * right
+        case 3: return left / right
+        case 4: return left ** rng.choice([2, 3, -1, 0.5])
+        case 5: return Math.sin(left) + Math.cos(right)
+        case 6: return Math.sqrt(left) * Math.log(right)
+        case _: return Math.hypot(left, right) - Math.atan(left)
+
+FORMULAS: list[Formula] = [Formula(smooth_production(random.Random(seed), 4) + X * Y) for seed in range(200)]
+
+
+def test_diff():
+    # compared with central differences where they are accurate
+    for formula in FORMULAS:
+        derivatives: dict[str, Formula] = {name: formula.diff(name) for name in ('x', 'y')}
+        for point in POINTS:
+            value = evaluate(formula, point)
+            if isinstance(value, type) or abs(value) > 1e3:
+                continue
+            for name, derivative in derivatives.items():
+                exact = evaluate(derivative, point)
+                up, down = evaluate(formula, {**point, name: point[name] + STEP}), evaluate(formula, {**point, name: point[name] - STEP})
+                if any(isinstance(item, type) for item in (exact, up, down)) or abs(exact) > 1e3:
+                    continue
+                assert same((up - down) / (2 * STEP), exact, 1e-4, 1e-6), (formula.text(), name, point)
+
+def test_value_and_grad():
+    for formula in FORMULAS:
+        derivatives: dict[str, Formula] = {name: formula.diff(name) for name in ('x', 'y')}
+        for point in POINTS:
+            try:
+                value, gradient = formula.value_and_grad(**point)
+            except ERRORS:
+                # a local derivative is undefined, though the symbolic one may have folded it away
+                continue
+            assert same(value, evaluate(formula, point)), formula.text()
+            assert gradient.keys() == derivatives.keys()
+            for name, derivative in derivatives.items():
+                assert same(gradient[name], evaluate(derivative, point), 1e-9, 1e-12), (formula.text(), name, point)
+
+@pytest.mark.parametrize('production, name', [
+    (Math.branch(X, X > 0, -X), 'branch'), (Math.logicand(X > 1, Y) * X, 'and'), (Math.sin(Math.logicor(X, Y < 1)), 'or'), 
+])
+def test_control(production, name: str):
+    # the function is reported instead of the condition in it
+    formula: Formula = Formula(production + X * Y)
+    with pytest.raises(ValueError, match=f'function {name} is not differentiable'):
+        formula.diff('x')
+    with pytest.raises(ValueError, match=f'function {name} is not differentiable'):
+        formula.value_and_grad(x=1, y=2)
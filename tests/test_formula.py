@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+
+import random
+
+import pytest
+
+from MEP import Formula, call_many
+from MEP import formula as formula_module
+from helpers import POINTS, evaluate, identical, random_formula
+
+
+@pytest.mark.parametrize('backend', ['closure', 'compiled', 'vm'])
+def test_call_many(backend: str, monkeypatch):
+    monkeypatch.setattr(formula_module, '_named_formulas', {})
+    names: list[str] = []
+    for seed in range(100):
+        formula: Formula = random_formula(random.Random(seed), 4)
+        if all(not isinstance(evaluate(formula, point), type) for point in POINTS):
+            other: Formula = Formula.parse(formula.text(), f'f{seed}')
+            other.set_backend(backend)
+            names.append(f'f{seed}')
+    rng: random.Random = random.Random(0)
+    requests: list[tuple[str, dict]] = [(rng.choice(names), rng.choice(POINTS)) for _ in range(300)]
+    results: list = call_many(requests)
+    assert all(identical(evaluate(formula_module.find(name), kwargs), value) for (name, kwargs), value in zip(requests, results))
+    # formulas are evaluated by their backends, nothing is compiled for the others
+    assert all((formula_module.find(name)._formula._compiled is None) == (backend != 'compiled') for name in names)
+
+def test_call_many_arguments(monkeypatch):
+    monkeypatch.setattr(formula_module, '_named_formulas', {})
+    Formula.parse('x + y', 'f')
+    with pytest.raises(ValueError):
+        call_many([('f', {'x': 1, 'y': 2}), ('f', {'x': 1})])
+    with pytest.raises(ValueError):
+        call_many([('g', {'x': 1})])
+    assert call_many([]) == []
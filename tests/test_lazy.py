@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+
+import pytest
+
+from MEP import X, Y, Formula, Math
+
+
+calls: list = []
+Math.define(lambda value: calls.append(value) or value, '_test_lazy_spy', False)
+
+
+def nest(depth: int) -> Formula:
+    # every level is in an argument that may be skipped
+    production = X
+    for i in range(depth):
+        production = Math.branch(Y, X < -i - 1, Math.logicand(X > Y - 2, production + 1))
+    return Formula(production)
+
+def reference(depth: int, x, y):
+    value = x
+    for i in range(depth):
+        value = y if x < -i - 1 else (True if x > y - 2 and value + 1 else False)
+    return value
+
+POINTS: list[tuple] = [(1.5, 0.5), (-5, 0.5), (-1.5, -3), (-4000, 2)]
+
+@pytest.mark.parametrize('backend', ['closure', 'compiled', 'vm'])
+def test_only_selected_arguments(backend: str):
+    spy = Math._test_lazy_spy
+    formula: Formula = Formula(Math.branch(spy(X), X > 0, spy(-X), X < 0, spy(Y)) + Math.logicor(spy(X) > 1, spy(Y)))
+    formula.set_backend(backend)
+    for x, y, expected_value, expected_calls in [(2, 5, 3, [2, 2]), (-1, 5, 2, [1, -1, 5]), (0, 5, 6, [5, 0, 5])]:
+        calls.clear()
+        assert formula.subs(x=x, y=y).value() == expected_value
+        assert calls == expected_calls
+
+@pytest.mark.parametrize('backend', ['closure', 'compiled', 'vm'])
+def test_deep_nesting(backend: str):
+    formula: Formula = nest(1000)
+    formula.set_backend(backend)
+    for x, y in POINTS:
+        assert formula.subs(x=x, y=y).value() == reference(1000, x, y)
+
+def test_deep_nesting_batch():
+    numpy = pytest.importorskip('numpy')
+    values = nest(1000).evaluate_batch(x=numpy.array([x for x, _ in POINTS]), y=numpy.array([y for _, y in POINTS]))
+    assert values.tolist() == [reference(1000, x, y) for x, y in POINTS]
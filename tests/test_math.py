@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+
+
+import pytest
+
+from MEP import X, Formula, Math
+
+
+@pytest.mark.parametrize('name', ['sin', 'toint', 'int', 'lcg', 'rtd', 'branch'])
+def test_define_existing_name(name: str):
+    # names of formulas are resolved through the same table by parsing and loading
+    with pytest.raises(ValueError):
+        Math.define(lambda x: -x, name)
+    assert Formula.parse('int(x) + sin(0)').subs(x=2.5).value() == 2
+
+def test_define():
+    Math.define(lambda x: x * 3, '_test_math_triple')
+    formula: Formula = Formula(Math._test_math_triple(X) + 1)
+    assert formula.subs(x=2).value() == 7
+    assert Formula.parse(formula.text()).subs(x=2).value() == 7
+    assert Formula.loads(formula.dumps()).subs(x=2).value() == 7
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+
+import random
+
+import pytest
+
+from MEP import X, Y, Formula, Numeric
+from helpers import POINTS, evaluate, random_production, same
+
+
+@pytest.mark.parametrize('production', [
+    Numeric(-2) ** X, Numeric(-1) ** (-X), Numeric(-2.5) ** X, X ** Numeric(-2), 
+    Numeric(1j) ** X, Numeric(-1j) ** X, X - Numeric(-2), -(X ** 2), (-X) ** 2, 
+])
+def test_round_trip(production) -> None:
+    formula: Formula = Formula(production)
+    parsed: Formula = Formula.parse(formula.text())
+    for point in POINTS:
+        point = {'x': point['x']}
+        assert same(evaluate(formula, point), evaluate(parsed, point)), formula.text()
+
+def test_round_trip_random() -> None:
+    rng: random.Random = random.Random(0)
+    for _ in range(300):
+        # both arguments appear in every formula, so every point substitutes it
+        formula: Formula = Formula(random_production(rng, 4) + X * Y)
+        parsed: Formula = Formula.parse(formula.text())
+        assert parsed.text() == Formula.parse(parsed.text()).text()
+        for point in POINTS:
+            assert same(evaluate(formula, point), evaluate(parsed, point)), formula.text()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from MEP import X, Y, Formula, Math, Numeric, Symbol, config
+
+
+PRODUCTIONS: list = [X, Symbol('z1'), Numeric(2), X * 2 + Y, -X, Math.sin(X) + 1]
+# SAFE_MODE is read on import, so unsafe productions are checked in another process
+UNSAFE: str = '''
+import importlib.util, sys
+spec = importlib.util.spec_from_file_location('MEP.config', sys.argv[1])
+config = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(config)
+config.SAFE_MODE = False
+sys.modules['MEP.config'] = config
+from MEP import X, Formula
+func, tree, args = (X * 2 + 1)._attributes
+assert args == {'x'} and func({'x': 3}) == 7
+try:
+    X.sign = 'y'
+except AttributeError:
+    print('sealed')
+'''
+
+
+@pytest.mark.parametrize('production', PRODUCTIONS)
+def test_sealed(production):
+    assert config.SAFE_MODE
+    for name in ('_attributes', '_func', '_tree', '_args', '_locked', '__dict__'):
+        with pytest.raises(AttributeError):
+            getattr(production, name)
+    for name in ('_attributes', '_func', 'sign'):
+        with pytest.raises(AttributeError):
+            setattr(production, name, None)
+    # sealing leaves productions working
+    assert Formula.parse(Formula(production + X).text()).text() == Formula(production + X).text()
+
+def test_unsafe():
+    package: str = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result: subprocess.CompletedProcess = subprocess.run(
+        [sys.executable, '-c', UNSAFE, os.path.join(package, 'MEP', 'config.py')],
+        cwd=package, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout == 'sealed\n'
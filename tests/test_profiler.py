@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+
+import pytest
+
+from MEP import X, Y, Formula, Math
+
+
+SAMPLES: list[dict] = [{'x': 1, 'y': 2}, {'x': -1, 'y': 3}, {'x': -2, 'y': 4}]
+
+
+def rows(profile: str) -> list[tuple[int, float, float, int, str]]:
+    # calls, total ms, self ms, exceptions and the indented label of every node of an annotated tree
+    header, *lines = profile.split('\n')[1:]
+    result: list[tuple[int, float, float, int, str]] = []
+    for line in lines:
+        calls, total, self_, _, exceptions = line[:header.index('node')].split()
+        result.append((int(calls), float(total), float(self_), int(exceptions), line[header.index('node'):]))
+    return result
+
+def test_every_node():
+    formula: Formula = Formula(Math.sin(X) * Y + X ** 2 - Math.hypot(X, Y))
+    profile: str = formula.profile(SAMPLES)
+    assert profile.split('\n')[0] == '3 samples, 0 failed'
+    table: list = rows(profile)
+    assert [label for *_, label in table] == ['-', '  +', '    *', '      sin()', '    **', '  hypot()']
+    assert all(calls == 3 and exceptions == 0 for calls, _, _, exceptions, _ in table)
+    # times are cumulative, a node takes at least as long as its children
+    assert all(total >= 0 and self_ >= -0.001 for _, total, self_, _, _ in table)
+    assert table[0][1] >= table[1][1] + table[5][1] - 0.001
+
+def test_lazy_nodes():
+    # only the conditions up to the first that holds and the selected value are evaluated
+    formula: Formula = Formula(Math.branch(Math.sin(X), X > 0, Math.cos(X) + 1) * Y + Math.logicand(X > 0, Math.floor(Y) > 2))
+    table: list = rows(formula.profile(SAMPLES))
+    assert [(label.strip(), calls) for calls, _, _, _, label in table] == [
+        ('+', 3), ('*', 3), ('branch()', 3), ('sin()', 1), ('>', 3), ('+', 2), ('cos()', 2),
+        ('and()', 3), ('>', 3), ('>', 1), ('floor()', 1),
+    ]
+
+def test_exceptions():
+    formula: Formula = Formula(Math.branch(1 / X, Y > 2, X) + Y)
+    profile: str = formula.profile([{'x': 0, 'y': 3}, {'x': 0, 'y': 1}, {'x': 2, 'y': 3}])
+    assert profile.split('\n')[0] == '3 samples, 1 failed'
+    assert [(calls, exceptions, label.strip()) for calls, _, _, exceptions, label in rows(profile)] == [
+        (3, 0, '+'), (3, 0, 'branch()'), (2, 1, '/'), (3, 0, '>'),
+    ]
+
+def test_collapsed():
+    formula: Formula = Formula(Math.sin(X) * Y + X)
+    for line in formula.profile(SAMPLES * 100, 'collapsed').split('\n'):
+        path, microseconds = line.rsplit(' ', 1)
+        assert path in ('+', '+;*', '+;*;sin()') and int(microseconds) > 0
+    with pytest.raises(ValueError):
+        formula.profile(SAMPLES, 'flame')
+    with pytest.raises(ValueError):
+        formula.profile([{'x': 1}])
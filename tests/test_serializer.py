@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+
+
+import random
+
+import pytest
+
+from MEP import X, Y, Formula, Math, find, load_library, dump_library
+from MEP import formula as formula_module
+from MEP.production import _Tree
+from MEP.serializer import _TreeSerializer
+from helpers import POINTS, evaluate, identical, random_formula
+
+
+FORMULA: Formula = Formula(Math.sin(X) * Y + Math.log(X + 1, 2) - X ** 2 / 3 + (X < Y))
+
+
+def test_round_trip():
+    loaded: Formula = Formula.loads(FORMULA.dumps())
+    assert loaded.text() == FORMULA.text()
+    assert loaded.subs(x=2, y=3).value() == FORMULA.subs(x=2, y=3).value()
+
+def test_round_trip_random():
+    for seed in range(200):
+        formula: Formula = random_formula(random.Random(seed), 4)
+        loaded: Formula = Formula.loads(formula.dumps())
+        assert loaded.text() == formula.text()
+        for point in POINTS:
+            assert identical(evaluate(formula, point), evaluate(loaded, point)), formula.text()
+
+def test_truncated_data():
+    data: bytes = FORMULA.dumps()
+    for size in range(len(data)):
+        with pytest.raises(ValueError):
+            Formula.loads(data[:size])
+
+def test_corrupted_data():
+    # any damage is either harmless or reported as bad data
+    data: bytes = FORMULA.dumps()
+    rng: random.Random = random.Random(0)
+    for _ in range(2000):
+        corrupted: bytearray = bytearray(data)
+        for _ in range(rng.randint(1, 3)):
+            corrupted[rng.randrange(5, len(corrupted))] = rng.randrange(256)
+        try:
+            Formula.loads(bytes(corrupted))
+        except ValueError:
+            pass
+
+def test_corrupted_library(tmp_path, monkeypatch):
+    monkeypatch.setattr(formula_module, '_libraries', [])
+    names: list[str] = [f'_test_serializer_{i}' for i in range(4)]
+    for i, name in enumerate(names):
+        Formula(X * i + Math.sin(Y), name)
+    path = tmp_path / 'library'
+    dump_library(str(path), names)
+    for name in names:
+        formula_module._named_formulas.pop(name)
+    data: bytes = path.read_bytes()
+
+    rng: random.Random = random.Random(0)
+    for _ in range(500):
+        corrupted: bytearray = bytearray(data)
+        corrupted[rng.randrange(5, len(corrupted))] = rng.randrange(256)
+        path.write_bytes(bytes(corrupted[:rng.randint(0, len(corrupted))] if rng.random() < 0.2 else corrupted))
+        formula_module._libraries.clear()
+        try:
+            load_library(str(path))
+            for name in names:
+                find(name)
+        except ValueError:
+            pass
+
+@pytest.mark.parametrize('sign', ["y=print('loaded')", 'import', 'y ', '1y', ''])
+def test_bad_argument_names(sign: str, capsys):
+    # names are pasted into the source of compiled functions
+    tree = Formula(X * Y)._formula._tree
+    for data in (_TreeSerializer._encode(tree, {'x', 'y', sign}), 
+                 _TreeSerializer._encode(_Tree._OperatorProductionTree2E('*', tree, _Tree._SymbolProductionTree(sign), 5), {'x', 'y', sign})):
+        with pytest.raises(ValueError):
+            Formula.loads(data).compile()(1, 2, 3)
+    assert capsys.readouterr().out == ''
+
+def test_missing_arguments():
+    with pytest.raises(ValueError):
+        Formula.loads(_TreeSerializer._encode(Formula(X * Y)._formula._tree, {'x'}))
+    # arguments that are no longer in the tree, such as of derivatives, are kept
+    derivative: Formula = Formula(X + Y).diff('x')
+    assert Formula.loads(derivative.dumps()).subs(x=1, y=2).value() == 1
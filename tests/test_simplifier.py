@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+
+import random
+
+import pytest
+
+from MEP import X, Y, Formula, Numeric, config
+from helpers import POINTS, evaluate, identical, random_formula
+
+
+FORMULAS: list[Formula] = [random_formula(random.Random(seed), 4) for seed in range(300)]
+IDENTITIES: list = [
+    X * 1, 1 * X, X + 0, 0 + X, X - 0, X ** 1, X * 1.0, X + 0.0, X * True, X + False, 
+    (X > Y) * 1, (X > Y) + 0, (X > Y) - 0, (X > Y) ** 1, -X + 0, X * Numeric(1) * 2 + 0, 
+]
+
+
+def test_simplify():
+    for formula in FORMULAS:
+        simplified: Formula = formula.simplify()
+        for point in POINTS:
+            assert identical(evaluate(formula, point), evaluate(simplified, point)), formula.text()
+
+@pytest.mark.parametrize('production', IDENTITIES)
+def test_identities(production):
+    # the types of values are kept, such as bools, floats and -0.0
+    formula: Formula = Formula(production + X * Y)
+    simplified: Formula = formula.simplify()
+    for point in [*POINTS, {'x': -0.0, 'y': 0}, {'x': True, 'y': 1}, {'x': 1j, 'y': 2}]:
+        assert identical(evaluate(formula, point), evaluate(simplified, point)), formula.text()
+
+def test_curry():
+    for formula in FORMULAS:
+        for point in POINTS:
+            expected = evaluate(formula, point)
+            assert identical(expected, evaluate(formula.curry(x=point['x']), {'y': point['y']})), formula.text()
+            assert identical(expected, evaluate(formula.curry(y=point['y']), {'x': point['x']})), formula.text()
+
+def test_auto_simplify(monkeypatch):
+    monkeypatch.setattr(config, 'AUTO_SIMPLIFY', True)
+    for seed, formula in enumerate(FORMULAS[:100]):
+        folded: Formula = random_formula(random.Random(seed), 4)
+        for point in POINTS:
+            assert identical(evaluate(formula, point), evaluate(folded, point)), formula.text()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+
+import pytest
+
+from MEP import X, Y, Formula, Math, Symbol
+
+
+Z = Symbol('z')
+
+
+@pytest.mark.parametrize('production, text', [
+    # precedence and associativity, the texts before templates lost the parentheses of right operands
+    (X + Y * 2, 'x+y*2'), ((X + Y) * 2, '(x+y)*2'), (X - Y - 1, 'x-y-1'), (X - (Y - 1), 'x-(y-1)'), 
+    (X / (Y * 2), 'x/(y*2)'), (X % Y // 2, 'x%y//2'), (X ** Y ** 2, 'x**y**2'), ((X ** Y) ** 2, '(x**y)**2'), 
+    ((X < Y) + True, '(x<y)+True'), ((X + 1 <= Y * 2) == (X > Y), 'x+1<=y*2==(x>y)'), 
+    ((X & Y | X ^ ~Y) << 2 >> 1, '(x&y|(x^(~y)))<<2>>1'), 
+    # unary minus and negative numbers
+    (-X + -(Y * 2), '(-x)+(-(y*2))'), (-(X ** 2), '(-x**2)'), ((-X) ** 2, '(-x)**2'), 
+    (X * -2 + X - -1.5, 'x*-2+x--1.5'), (X * 1j + (2 + 1j) * Y, 'x*1j+(2+1j)*y'), 
+    (X * 0.5 + 1e300 - Y * 1.25e-7, 'x*0.5+1e+300-y*1.25e-07'), (2 - X + 3 / Y + 2 ** X, '2-x+3/y+2**x'), 
+    # function calls
+    (Math.sin(X + 1) * Math.log(X, 2) + Math.hypot(X, Y, Z), 'sin(x+1)*log(x, 2)+hypot(x, y, z)'), 
+    (Math.sqrt(Math.sin(X) ** 2 + Math.cos(-Y)), 'sqrt(sin(x)**2+cos((-y)))'), 
+    (abs(X - Y) + round(X, 2), 'abs(x-y)+round(x, 2)'), (Math.toint(X / 2) + Math.tofloat(Y), 'int(x/2)+float(y)'), 
+    (Math.branch(X, Y > 0, -X), 'branch(x, y>0, (-x))'), 
+])
+def test_formula_text(production, text: str):
+    assert Formula(production).text() == text
+
+@pytest.mark.parametrize('production, kwargs, text', [
+    (X + Y * 2, {'x': 1, 'y': -2}, '1+(-2)*2'), (X ** Y, {'x': -2, 'y': 2}, '(-2)**2'), 
+    (X - Y, {'x': 1.5, 'y': -0.5}, '1.5-(-0.5)'), (X * Y - X, {'x': -1, 'y': 3}, '(-1)*3-(-1)'), 
+    (Math.sin(X) * Y, {'x': 1j, 'y': 2 + 1j}, 'sin(1j)*(2+1j)'), (X / Y, {'x': -1j, 'y': -2.5}, '(-0-1j)/(-2.5)'), 
+    ((X < Y) + X, {'x': True, 'y': 2}, '(True<2)+True'), (X * X + Y, {'x': 3, 'y': 4}, '3*3+4'), 
+])
+def test_expression_text(production, kwargs: dict, text: str):
+    # values are pasted into the template of formula, negative ones in parentheses
+    assert Formula(production).subs(**kwargs).text() == text
+
+def test_lazy_text():
+    # composing formulas renders none of them, the text is built on the first "text" or "subs"
+    formulas: list[Formula] = [Formula(X)]
+    for i in range(200):
+        formulas.append(formulas[-1] * 2 + Formula(Y - i) if i % 2 else formulas[-1] - Formula(X ** i))
+    assert all(formula._formula._tree_str is None for formula in formulas)
+    text: str = formulas[-1].text()
+    assert all(formula._formula._tree_str is None for formula in formulas[:-1])
+    assert text == Formula.parse(text).text()
+    assert text.startswith('(' * 100) and text.endswith('*2+(y-199)')
+    assert formulas[3].subs(x=1, y=2).text() == '(1-1**0)*2+(2-1)-1**2'
+
+def test_composed_text():
+    assert (Formula(X * 2) + Formula(Y + 1) * Formula(X - Y)).text() == 'x*2+(y+1)*(x-y)'
+    assert (Formula(X - Y) - Formula(X - Y)).text() == 'x-y-(x-y)'
+    assert (-Formula(X + 1) ** Formula(-Y)).text() == '(-(x+1)**(-y))'